@@ -1,15 +1,26 @@
 import re
-import urllib.parse
-from ddgs import DDGS
+import copy
+import hashlib
+import inspect
 import asyncio
 import aiohttp                  # ← NEW: Async HTTP client
-from bs4 import BeautifulSoup
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 import time
-import chromadb                 # ← NEW: Vector DB for persistence
-from chromadb.config import Settings
+from research_core.ranking import rank, cosine_scores, normalize_rows, top_k, mmr
+from research_core.search import search_all, default_providers, DDGSProvider
+from research_core.extract import get_extractor
+from research_core.page_cache import PageCache
+from research_core.embed_cache import EmbeddingCache
+from research_core.result_cache import ResultCache, result_key
+from research_core.http import get_http_client, is_text_response, read_text_capped, DEFAULT_MAX_BODY_BYTES
+from research_core.embed_service import EmbeddingService, DEFAULT_EMBED_THREADS
+from research_core.embed_pool import MultiProcessEmbedder, DEFAULT_EMBED_PROCESSES
+from research_core.embedders import load_embedder, DEFAULT_EMBED_BACKEND
+from research_core.chunking import TokenizedText
+from research_core.dedup import NearDuplicateFilter, DEFAULT_DEDUP_THRESHOLD
+from research_core.bm25 import query_terms, bm25_order, bm25_scores
+from research_core.host_health import HostHealthRegistry, FAILURE_STATUSES
+from research_core.vector_store import open_vector_store, ChromaVectorStore, DEFAULT_VECTOR_STORE
 
 # DEFAULT CONSTANTS (unchanged)
 DEFAULT_SEARCH_RESULTS = 13
@@ -18,178 +29,711 @@ EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 DEFAULT_TOP_PASSAGES = 5
 DEFAULT_SUMMARY_SENTENCES = 3
 DEFAULT_TIMEOUT = 16
+DEFAULT_FETCH_DEADLINE = 25       # total seconds the fetch stage may take per run
+DEFAULT_EMBED_BATCH = 32          # micro-batch size for streaming embeddings
+DEFAULT_EARLY_STOP_SCORE = 0.5    # passages at/above this count towards early stop
+DEFAULT_LOCAL_MIN_SCORE = 0.6     # stored passages must score at least this to answer locally
+DEFAULT_LOCAL_MAX_AGE = 7 * 24 * 3600  # ...and be younger than this (seconds)
+DEFAULT_DEADLINE_RESERVE = 0.2    # share of a run deadline kept back for ranking + summary
+DEFAULT_SUMMARY_CANDIDATES = 24   # sentences that reach the dense scorer after the lexical prefilter
 
-def unwrap_ddg(url):  # unchanged
-    try:
-        parsed = urllib.parse.urlparse(url)
-        if "duckduckgo.com" in parsed.netloc:
-            qs = urllib.parse.parse_qs(parsed.query)
-            uddg = qs.get("uddg")
-            if uddg:
-                return urllib.parse.unquote(uddg[0])
-    except Exception:
-        pass
-    return url
-
-def search_web(query, max_results=DEFAULT_SEARCH_RESULTS):  # unchanged
-    urls = []
-    with DDGS() as ddgs:
-        for r in ddgs.text(query, max_results=max_results):
-            url = r.get("href") or r.get("url")
-            if url:
-                urls.append(unwrap_ddg(url))
-    return urls
+def search_web(query, max_results=DEFAULT_SEARCH_RESULTS):  # sync, kept for scripts
+    return DDGSProvider._search_sync(query, max_results)
+
+# NEW: non-blocking search over pluggable providers (research_core/search.py)
+async def search_web_async(query, max_results=DEFAULT_SEARCH_RESULTS, providers=None):
+    return await search_all(providers or default_providers(), query, max_results)
 
 # NEW ASYNC FETCH FUNCTION
-async def fetch_text_async(session, url, timeout=DEFAULT_TIMEOUT):
-    """Async version of fetch_text using aiohttp"""
+async def fetch_page_async(session, url, timeout=DEFAULT_TIMEOUT, extractor=None, cache=None, health=None,
+                           max_bytes=DEFAULT_MAX_BODY_BYTES):
+    """
+    Fetch one page and extract its text in the HTML process pool.
+    With a PageCache, fresh entries skip the network and stale ones are
+    revalidated with If-None-Match / If-Modified-Since.
+    With a HostHealthRegistry, failing hosts are skipped (status "skipped") and the
+    connect / read timeouts come from the host's observed p95 latency, measured from
+    the moment the request holds a socket; `timeout` still bounds the whole request,
+    including the wait for a per-host connection slot. Bodies are streamed and
+    cut at max_bytes ("truncated" in the result).
+    Returns a dict with url, status, text, chars, extract_ms and cache ("hit" / "revalidated" / "miss").
+    """
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
     }
+    page = {"url": url, "status": None, "text": "", "chars": 0, "extract_ms": 0.0, "cache": None, "truncated": False}
+    trace = {}   # request_at / socket_at stamps from HttpClient's trace hooks
     try:
-        async with session.get(url, timeout=timeout, headers=headers, allow_redirects=True) as resp:
+        cached = await cache.aget(url) if cache is not None else None
+        if cached and cached["fresh"]:
+            page.update(text=cached["text"], chars=len(cached["text"]), cache="hit")
+            return page
+        if cached:
+            headers = dict(headers)
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+        if cache is not None:
+            page["cache"] = "miss"
+        if health is not None:
+            if health.should_skip(url):
+                print(f"Skipping: {url} (host backing off after repeated failures)")
+                page["status"] = "skipped"
+                return page
+            host_timeout = health.timeout_for(url, timeout)
+            client_timeout = aiohttp.ClientTimeout(total=timeout, sock_connect=host_timeout, sock_read=host_timeout)
+        else:
+            client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+        t0 = time.perf_counter()
+        async with session.get(url, timeout=client_timeout, headers=headers, allow_redirects=True,
+                               trace_request_ctx=trace) as resp:
             print(f"Fetching: {url} → Status: {resp.status}")
+            page["status"] = resp.status
+            if health is not None:
+                if resp.status in FAILURE_STATUSES or resp.status >= 500:
+                    health.record_failure(url, resp.status)
+                else:
+                    # latency of the host itself, not of our queue for a connection slot
+                    health.record_success(url, time.perf_counter() - trace.get("socket_at", t0), resp.status)
+            if resp.status == 304 and cached:
+                await cache.amark_revalidated(url)
+                page.update(text=cached["text"], chars=len(cached["text"]), cache="revalidated")
+                return page
             if resp.status != 200:
-                return ""
-            text = await resp.text()
-            ct = resp.headers.get("content-type", "").lower()
-            if not any(x in ct for x in ["html", "text"]):
-                return ""
-            
-            soup = BeautifulSoup(text, "html.parser")
-            for tag in soup(["script", "style", "noscript", "header", "footer", "svg", "iframe", "nav", "aside"]):
-                tag.extract()
-            
-            paragraphs = [p.get_text(" ", strip=True) for p in soup.find_all("p")]
-            content = " ".join(p for p in paragraphs if p)
-            cleaned = re.sub(r"\s+", " ", content).strip()
-            print(f"  → Success: {len(cleaned)} chars")
-            return cleaned
+                return page
+            # reject PDFs / binaries on headers alone, then read at most max_bytes
+            if not is_text_response(resp):
+                print(f"  → Skipped {url}: content-type {resp.headers.get('content-type', 'missing')}")
+                return page
+            text, page["truncated"] = await read_text_capped(resp, max_bytes)
+            etag, last_modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+
+        # CPU-bound parse runs off the event loop (lxml where available)
+        cleaned, extract_ms = await (extractor or get_extractor()).extract(text)
+        page.update(text=cleaned, chars=len(cleaned), extract_ms=round(extract_ms, 2))
+        print(f"  → Success: {len(cleaned)} chars ({extract_ms:.1f} ms extract)")
+        if cache is not None and cleaned:
+            await cache.aput(url, cleaned, etag, last_modified)
     except Exception as e:
         print(f"  → Error {url}: {type(e).__name__}")
-        return ""
+        # timeouts / connection errors before a response count against the host, unless the
+        # request timed out still queued for a connection slot (our congestion, not the host's)
+        queued = "request_at" in trace and "socket_at" not in trace
+        if health is not None and page["status"] is None and not queued:
+            health.record_failure(url, type(e).__name__)
+    return page
+
+async def fetch_text_async(session, url, timeout=DEFAULT_TIMEOUT):
+    """Async version of fetch_text using aiohttp"""
+    return (await fetch_page_async(session, url, timeout))["text"]
 
 class ShortResearchAgent:
-    def __init__(self, embed_model=EMBEDDING_MODEL, persist_dir="./chroma_research_db"):
-        print(f"Loading embedder: {embed_model}...")
-        self.embedder = SentenceTransformer(embed_model)
+    def __init__(self, embed_model=EMBEDDING_MODEL, persist_dir=None,
+                 embed_backend=DEFAULT_EMBED_BACKEND, embedder=None, chroma_client=None, search_providers=None, page_cache=None,
+                 embed_cache=None, result_cache=None, http_client=None, embed_service=None, host_health=None,
+                 vector_store=None, vector_backend=DEFAULT_VECTOR_STORE, embed_processes=DEFAULT_EMBED_PROCESSES):
+        # embedder / vector_store / caches let a warm pool share one loaded model, client and cache set
+        if embedder is None:
+            print(f"Loading embedder: {embed_model} ({embed_backend} backend)...")
+            embedder = load_embedder(embed_model, embed_backend, num_threads=DEFAULT_EMBED_THREADS)
+        self.embedder = embedder
+        self.embed_model = embed_model
+        self.embed_backend = embed_backend
+        # one micro-batching encode thread shared by every run / pooled agent; large jobs
+        # optionally fan out to embed_processes worker processes (RESEARCH_EMBED_PROCESSES)
+        if embed_service is None:
+            mp_embedder = MultiProcessEmbedder(embed_model, embed_backend, embed_processes) if embed_processes > 0 else None
+            embed_service = EmbeddingService(embedder, mp_embedder=mp_embedder)
+        self.embed_service = embed_service
+        self.search_providers = search_providers or default_providers()
+        self.page_cache = page_cache or PageCache()
+        # backends produce slightly different vectors, so they get separate cache namespaces
+        cache_name = embed_model if embed_backend == "torch" else f"{embed_model}@{embed_backend}"
+        self.embed_cache = embed_cache or EmbeddingCache(cache_name)
+        self.result_cache = result_cache or ResultCache()
+        self.http = http_client or get_http_client()  # long-lived pooled session
+        self.host_health = host_health or HostHealthRegistry()  # skip failing hosts, per-host timeouts
         
-        # NEW: ChromaDB Persistence
+        # NEW: Passage persistence
         self.persist_dir = persist_dir
-        self.chroma_client = chromadb.PersistentClient(path=persist_dir)
-        self.collection = self.chroma_client.get_or_create_collection("research_passages")
-        print(f"ChromaDB initialized at {persist_dir}")
-
-    # NEW: Async batch fetching
-    async def _gather_pages(self, urls, timeout):
-        async with aiohttp.ClientSession() as session:
-            tasks = [fetch_text_async(session, u, timeout) for u in urls]
-            return await asyncio.gather(*tasks)   # Parallel fetching
-        
-        
+        # passage store for local knowledge: Chroma or the mmap float16 flat index (research_core/vector_store.py)
+        if vector_store is None:
+            vector_store = (ChromaVectorStore(client=chroma_client) if chroma_client is not None
+                            else open_vector_store(vector_backend, persist_dir))
+        self.vector_store = vector_store
+        self._pending_writes = set()
+        print(f"Vector store ready: {vector_store.name} ({vector_store.count()} passages)")
+
+    def shared_resources(self) -> dict:
+        """Heavy objects a pool hands to sibling agents instead of rebuilding them."""
+        return {"embedder": self.embedder, "vector_store": self.vector_store,
+                "page_cache": self.page_cache, "embed_cache": self.embed_cache,
+                "result_cache": self.result_cache, "http_client": self.http,
+                "embed_service": self.embed_service, "host_health": self.host_health}
+
+    def _persist_passages(self, passages, embeddings, query):
+        """
+        One batched write per run. Reuses our SentenceTransformer vectors so the store does not
+        re-embed with its default model, and content-hash IDs skip passages already stored.
+        """
+        now = time.time()
+        return self.vector_store.add(
+            ids=[passage_id(p["url"], p["passage"]) for p in passages],
+            embeddings=embeddings,
+            documents=[p["passage"] for p in passages],
+            metadatas=[{"url": p["url"], "query": p.get("query", query), "timestamp": now} for p in passages],
+        )
+
+    def _schedule_persist(self, passages, embeddings, query):
+        """Fire-and-forget background write; the result is returned without waiting on the store."""
+        async def _write():
+            try:
+                added = await asyncio.to_thread(self._persist_passages, passages, embeddings, query)
+                print(f"Persisted {added} new passages to {self.vector_store.name} ({len(passages) - added} already stored)")
+            except Exception as e:
+                print(f"Vector store persist failed: {type(e).__name__}: {e}")
+
+        task = asyncio.create_task(_write())
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+
+    def _query_local_sync(self, q_emb, k, min_score, max_age):
+        documents, metadatas, embs = self.vector_store.query(q_emb, 4 * k, min_timestamp=time.time() - max_age)
+        if not documents:
+            return [], None
+        # Re-score with our own cosine so the threshold means the same thing as for web passages
+        scores = cosine_scores(embs, q_emb)
+        keep = [i for i in np.argsort(-scores) if scores[i] >= min_score][:k]
+        docs = [{"url": metadatas[i].get("url", ""), "passage": documents[i], "source": "local"} for i in keep]
+        return docs, embs[keep]
+
+    async def _query_local(self, q_emb, k, min_score=DEFAULT_LOCAL_MIN_SCORE, max_age=DEFAULT_LOCAL_MAX_AGE):
+        """Up to k stored passages scoring >= min_score and younger than max_age, with their embeddings."""
+        try:
+            return await asyncio.to_thread(self._query_local_sync, q_emb, k, min_score, max_age)
+        except Exception as e:
+            print(f"Local knowledge lookup failed: {type(e).__name__}: {e}")
+            return [], None
+
+    @staticmethod
+    async def _within(stage, aw, deadline_at, cut_short, fallback=None):
+        """Await aw until deadline_at (loop time); on timeout record the stage as cut short."""
+        if deadline_at is None:
+            return await aw
+        try:
+            return await asyncio.wait_for(aw, max(0.0, deadline_at - asyncio.get_running_loop().time()))
+        except asyncio.TimeoutError:
+            print(f"Deadline reached during {stage}, continuing with partial results")
+            cut_short.append(stage)
+            return fallback
+
+    @staticmethod
+    def _report(progress, stage, fraction, detail=""):
+        """Per-stage progress for UIs; a failing callback never breaks the run."""
+        if progress is None:
+            return
+        try:
+            progress(stage, fraction, detail)
+        except Exception as e:
+            print(f"Progress callback failed: {type(e).__name__}: {e}")
+
+    async def aclose(self):
+        """Wait for background vector-store writes (called on pool / app shutdown)."""
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
+        await self.host_health.aflush()
+
+    async def _encode(self, texts):
+        """Encode via the shared micro-batching service; always returns a 2-D float32 array."""
+        embs = await self.embed_service.encode(texts)
+        return np.asarray(embs, dtype=np.float32).reshape(len(texts), -1)
+
+    async def _embed(self, texts, counter=None):
+        """Embedding cache in front of the model: only uncached text is encoded."""
+        return await self.embed_cache.aencode(texts, self._encode, counter)
+
+    # NEW: Streaming fetch -> chunk -> micro-batched embed (replaces _gather_pages)
+    async def _stream_passages(self, urls, q_emb, timeout, passages_per_page,
+                               early_stop_score=DEFAULT_EARLY_STOP_SCORE, early_stop_count=None,
+                               batch_size=DEFAULT_EMBED_BATCH, embed_counter=None,
+                               fetch_deadline=DEFAULT_FETCH_DEADLINE, dedup_threshold=DEFAULT_DEDUP_THRESHOLD,
+                               query=None, progress=None):
+        """
+        Process each page as soon as its fetch completes instead of waiting for the slowest URL.
+        Embedding of arrived passages overlaps with the fetches still in flight. Once
+        early_stop_count passages score >= early_stop_score, remaining fetches are cancelled;
+        the same happens when fetch_deadline seconds have passed. Passages that near-duplicate
+        an earlier one (MinHash Jaccard >= dedup_threshold) are dropped before embedding.
+        With a query, every chunk of a page is BM25-scored and the best passages_per_page
+        are embedded instead of the first ones. With a list of queries (run_many), each
+        query's best chunks are interleaved and the page keeps passages_per_page per query.
+        When the run can fill a job for the embedding worker processes (len(urls) * passages
+        per page >= the service's mp_threshold), passages are embedded in jobs of that size.
+        Returns (docs, embeddings, stats).
+        """
+        docs, emb_batches = [], []
+        strong = 0
+        dedup = NearDuplicateFilter(dedup_threshold) if dedup_threshold else None
+        stats = {"pages_fetched": 0, "pages_cancelled": 0, "early_stopped": False, "deadline_hit": False,
+                 "duplicates_removed": 0, "chunks_seen": 0, "hosts_skipped": 0, "pages": []}
+        queries = [query] if isinstance(query, str) else list(query or [])
+        term_sets = [t for t in (query_terms(q) for q in queries) if t]
+        per_page = passages_per_page * max(1, len(term_sets))
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + fetch_deadline if fetch_deadline else None
+
+        # a run large enough for the embedding worker processes is encoded in jobs of their
+        # threshold; cutting it into micro-batches first would keep every encode in-process
+        service = self.embed_service
+        mp_threshold = service.mp_threshold if service.mp_embedder is not None else 0
+        job_size = mp_threshold if mp_threshold and len(urls) * per_page >= mp_threshold else batch_size
+        waiting = []
+
+        async def embed(part):
+            nonlocal strong
+            embs = await self._embed([d["passage"] for d in part], embed_counter)
+            docs.extend(part)
+            emb_batches.append(embs)
+            if early_stop_score is not None:
+                strong += int(np.count_nonzero(cosine_scores(embs, q_emb) >= early_stop_score))
+
+        session = self.http.session()
+        pending = {asyncio.create_task(fetch_page_async(session, u, timeout, cache=self.page_cache,
+                                                        health=self.host_health)): u
+                   for u in urls}
+        try:
+            while pending:
+                remaining = None if deadline_at is None else deadline_at - loop.time()
+                if remaining is not None and remaining <= 0:
+                    print(f"Fetch deadline ({fetch_deadline}s) reached, cancelling {len(pending)} fetches")
+                    stats["deadline_hit"] = True
+                    break
+                done, _ = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                batch = []
+                for task in done:
+                    url = pending.pop(task)
+                    page = task.result()
+                    txt = page.pop("text")
+                    stats["pages_fetched"] += 1
+                    stats["pages"].append(page)  # per-page status / chars / extract_ms / cache
+                    self._report(progress, "fetch", 0.15 + 0.65 * stats["pages_fetched"] / len(urls),
+                                 f"{stats['pages_fetched']}/{len(urls)} pages")
+                    if not txt:
+                        continue
+                    # one tokenizing pass; only the passages we keep are sliced out of the page
+                    chunks = TokenizedText(txt).passages(max_words=120, overlap=20)
+                    stats["chunks_seen"] += len(chunks)
+                    order = page_order(term_sets, [p.text for p in chunks]) if term_sets else range(len(chunks))
+                    kept = 0
+                    for i in order:
+                        p = chunks[i]
+                        if kept >= per_page:
+                            break
+                        # syndicated copies never reach the embedder
+                        if dedup is not None and dedup.seen(p.text):
+                            continue
+                        batch.append({"url": url, "passage": p.text, "span": p})
+                        kept += 1
+
+                waiting.extend(batch)
+                # micro-batches are embedded every round; pool-sized jobs once full or the last page is in
+                while waiting and (job_size == batch_size or len(waiting) >= job_size or not pending):
+                    part, waiting = waiting[:job_size], waiting[job_size:]
+                    await embed(part)
+
+                if early_stop_count and strong >= early_stop_count and pending:
+                    print(f"Early stop: {strong} passages >= {early_stop_score}, cancelling {len(pending)} fetches")
+                    stats["early_stopped"] = True
+                    break
+            if waiting:
+                await embed(waiting)   # passages of pages that arrived before a stop or the deadline
+        finally:
+            stats["pages_cancelled"] = len(pending)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        if dedup is not None:
+            stats["duplicates_removed"] = dedup.removed
+        stats["hosts_skipped"] = sum(1 for p in stats["pages"] if p["status"] == "skipped")
+        # host health is written behind the run, like the passage persist
+        task = asyncio.create_task(self.host_health.aflush())
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+        embs = np.vstack(emb_batches) if emb_batches else np.empty((0, 0), dtype=np.float32)
+        return docs, embs, stats
+
+    async def run(self, query: str, use_cache=True, **params):
+        """
+        Research a query. Accepts the same keyword parameters as _run.
+        Results are cached by normalized query + params_used, and concurrent
+        identical requests share one in-flight pipeline run. deadline (a time budget) and
+        progress are not part of the cache key; runs cut short are never cached, and a
+        request only joins an in-flight run with at least as much time as it has, receiving
+        that run's progress events until its own deadline.
+        """
+        if not use_cache or self.result_cache is None:
+            return await self._run(query, **params)
+        bound = inspect.signature(self._run).bind(query, **params)
+        bound.apply_defaults()
+        params_used = {k: v for k, v in bound.arguments.items() if k not in ("query", "deadline", "progress")}
+        key = result_key(query, params_used)
+        return await self.result_cache.get_or_compute(
+            key, lambda emit: self._run(query, **{**params, "progress": emit}),
+            deadline=params.get("deadline"), progress=params.get("progress"),
+            fallback={"query": query, "summary": "No content fetched."})
+
     # changed to async def run()
-    async def run(self, query: str, search_results=DEFAULT_SEARCH_RESULTS, 
+    async def _run(self, query: str, search_results=DEFAULT_SEARCH_RESULTS, 
             passages_per_page=DEFAULT_PASSAGES_PER_PAGE,
             top_passages=DEFAULT_TOP_PASSAGES, 
             summary_sentences=DEFAULT_SUMMARY_SENTENCES, 
-            timeout=DEFAULT_TIMEOUT):
-        
+            timeout=DEFAULT_TIMEOUT,
+            diversity=None,
+            early_stop_score=DEFAULT_EARLY_STOP_SCORE,
+            early_stop_count=None,
+            local_first=True,
+            local_min_score=DEFAULT_LOCAL_MIN_SCORE,
+            local_max_age=DEFAULT_LOCAL_MAX_AGE,
+            fetch_deadline=DEFAULT_FETCH_DEADLINE,
+            dedup_threshold=DEFAULT_DEDUP_THRESHOLD,
+            lexical_prefilter=True,
+            deadline=None,
+            progress=None,
+            summary_candidates=DEFAULT_SUMMARY_CANDIDATES):
+            """
+            deadline: overall seconds for the run. When it runs out, outstanding work is
+            cancelled and the summary is built from the passages gathered so far;
+            result["cut_short"] lists the stages that did not finish.
+            progress: optional callback(stage, fraction, detail) called as stages complete.
+            summary_candidates: sentences kept by the lexical + passage-score prefilter before
+            dense scoring (0 / None encodes every sentence of the top passages).
+            """
             start = time.time()
-            urls = search_web(query, max_results=search_results)
-            print(f"Found {len(urls)} URLs.")
-
-            # ASYNC FETCH - this is the main performance win
-            # loop = asyncio.get_event_loop()
-            # texts = loop.run_until_complete(self._gather_pages(urls, timeout))
-            # --- FIXED: Use clean native await instead of extracting loop ---
-            texts = await self._gather_pages(urls, timeout)
-
-            # Rest of the logic is almost identical (chunking, embedding, ranking)
-            docs = []
-            for u, txt in zip(urls, texts):
-                if not txt:
-                    continue
-                chunks = chunk_passages(txt, max_words=120, overlap=20)
-                for c in chunks[:passages_per_page]:
-                    docs.append({"url": u, "passage": c})
+            loop = asyncio.get_running_loop()
+            deadline_at = loop.time() + deadline if deadline else None
+            cut_short = []
+            embed_counter = {"hits": 0, "misses": 0}
+            self._report(progress, "embed_query", 0.02)
+            q_emb = (await self._embed([query], embed_counter))[0]
+            pipeline_stats = {"pages_fetched": 0, "pages_cancelled": 0, "early_stopped": False,
+                              "deadline_hit": False, "duplicates_removed": 0, "chunks_seen": 0,
+                              "hosts_skipped": 0, "pages": []}
+
+            # LOCAL KNOWLEDGE FIRST: fresh, strong passages already in research_passages
+            local_docs, local_embs = [], None
+            if local_first:
+                local_docs, local_embs = await self._within(
+                    "local", self._query_local(q_emb, top_passages, min_score=local_min_score, max_age=local_max_age),
+                    deadline_at, cut_short, fallback=([], None))
+            shortfall = top_passages - len(local_docs)
+
+            if shortfall > 0:
+                # Off-loop search so other /chat and /agent requests keep running
+                self._report(progress, "search", 0.1, f"{len(local_docs)} local passages")
+                urls = await self._within(
+                    "search", search_web_async(query, max_results=search_results, providers=self.search_providers),
+                    deadline_at, cut_short, fallback=[])
+                print(f"Found {len(urls)} URLs ({len(local_docs)} local passages, shortfall {shortfall}).")
+                self._report(progress, "fetch", 0.15, f"{len(urls)} URLs")
+
+                # STREAMING FETCH -> CHUNK -> EMBED: latency follows the fastest sources
+                if early_stop_count is None:
+                    early_stop_count = 2 * shortfall
+                # the run deadline tightens the fetch deadline, keeping a reserve for the summary
+                fetch_budget = fetch_deadline
+                if deadline_at is not None:
+                    fetch_budget = max(0.001, deadline_at - loop.time() - deadline * DEFAULT_DEADLINE_RESERVE)
+                    if fetch_deadline:
+                        fetch_budget = min(fetch_budget, fetch_deadline)
+                docs, emb_txts, pipeline_stats = await self._stream_passages(
+                    urls, q_emb, timeout, passages_per_page,
+                    early_stop_score=early_stop_score, early_stop_count=early_stop_count,
+                    embed_counter=embed_counter, fetch_deadline=fetch_budget,
+                    dedup_threshold=dedup_threshold,
+                    query=query if lexical_prefilter else None, progress=progress)
+                if pipeline_stats["deadline_hit"] and fetch_budget != fetch_deadline:
+                    cut_short.append("fetch")
+            else:
+                print(f"Answering from {len(local_docs)} local passages, skipping web search.")
+                docs, emb_txts = [], None
+
+            if local_docs:
+                # a page persisted by an earlier run comes back from the web with the same passages
+                local_ids = {passage_id(d["url"], d["passage"]) for d in local_docs}
+                fresh = [i for i, d in enumerate(docs) if passage_id(d["url"], d["passage"]) not in local_ids]
+                if len(fresh) < len(docs):
+                    pipeline_stats["duplicates_removed"] += len(docs) - len(fresh)
+                    docs, emb_txts = [docs[i] for i in fresh], emb_txts[fresh]
+                docs = docs + local_docs
+                emb_txts = local_embs if emb_txts is None or not len(emb_txts) else np.vstack([emb_txts, local_embs])
 
             if not docs:
-                return {"query": query, "passages": [], "summary": "No content fetched."}
-
-            # Embedding & ranking (unchanged core logic)
-            texts = [d["passage"] for d in docs]
-           # emb_txts = self.embedder.encode(texts, convert_to_numpy=True)
-            #q_emb = self.embedder.encode(query, convert_to_numpy=True)
-            
-            # NEW ASYNC EMBEDDINGS
-            emb_txts = await asyncio.to_thread(self.embedder.encode, texts, show_progress_bar=True, convert_to_numpy=True)
-            q_emb = await asyncio.to_thread(self.embedder.encode, query, show_progress_bar=True, convert_to_numpy=True)
-
-            def cosine_sklearn(a, b):
-                a = np.asarray(a).reshape(1, -1)
-                b = np.asarray(b).reshape(1, -1)
-                return cosine_similarity(a, b)[0][0]
-
-            sims = [cosine_sklearn(e, q_emb) for e in emb_txts]
-            top_idx = np.argsort(sims)[::-1][:top_passages]
+                return {"query": query, "passages": [], "summary": "No content fetched.",
+                        "time": time.time() - start, "cut_short": cut_short, "partial": bool(cut_short)}
+
+            # Vectorized ranking: one normalized matmul + partial top-k (optional MMR diversity)
+            self._report(progress, "rank", 0.85, f"{len(docs)} passages")
+            top_idx, sims = rank(emb_txts, q_emb, top_passages, diversity=diversity)
             top_passages_list = [{"url": docs[i]["url"], "passage": docs[i]["passage"], "score": float(sims[i])} for i in top_idx]
+            local_hits = sum(1 for i in top_idx if docs[i].get("source") == "local")
 
-            # NEW: Persist top passages to ChromaDB
-            for p in top_passages_list:
-                self.collection.add(
-                    documents=[p["passage"]],
-                    metadatas=[{"url": p["url"], "query": query, "timestamp": time.time()}],
-                    ids=[f"passage_{int(time.time()*1000)}"]
-                )
+            # NEW: Persist top web passages to the vector store in one batched write, off the event loop
+            web_pos = [j for j, i in enumerate(top_idx) if docs[i].get("source") != "local"]
+            if web_pos:
+                self._schedule_persist([top_passages_list[j] for j in web_pos], emb_txts[top_idx[web_pos]], query)
 
             # Summary logic (unchanged)
             # ... (same sentence reranking as original)
             # 5. Rerank passages to passages to create a mini summary
-            sentences = []
-            for tp in top_passages_list:
-                for s in split_sentences(tp["passage"]):
-                    sentences.append({"sent": s, "url": tp["url"]})
-                    
+            sentences = passage_sentences(docs, top_idx, sims)
+            pipeline_stats["sentences_total"] = len(sentences)
             if not sentences:
                 summary = "No summary could be generated"
             else:
-                sent_texts = [s["sent"]for s in sentences]
+                # cheap lexical + passage-score prefilter; only the survivors are embedded
+                candidates = prefilter_sentences(query, sentences, summary_candidates)
+                pipeline_stats["sentences_encoded"] = len(candidates)
+                sent_texts = [s["sent"]for s in candidates]
                 #sent_embs = self.embedder.encode(sent_texts, convert_to_numpy=True, show_progress_bar=True)
                 # NEW ASYNCHRONOUS NON BLOCKING Offload summary sentence matrix multiplication to an internal worker thread
-                sent_embs = await asyncio.to_thread(self.embedder.encode, sent_texts, convert_to_numpy=True, show_progress_bar=True)
-                sent_sims = [cosine_sklearn(e, q_emb) for e in sent_embs]
-                
-                # 6. Select top sentences for summary
-                top_sent_idx = np.argsort(sent_sims)[::-1][:DEFAULT_SUMMARY_SENTENCES]
-                chosen = [sentences[idx] for idx in top_sent_idx]
+                self._report(progress, "summary", 0.9, f"{len(sent_texts)} sentences")
+                sent_embs = await self._within(
+                    "summary", self._embed(sent_texts, embed_counter), deadline_at, cut_short)
+
+                # 6. Select top sentences for summary (same ranking path as passages)
+                if sent_embs is not None:
+                    top_sent_idx, _ = rank(sent_embs, q_emb, summary_sentences, diversity=diversity)
+                    chosen = [candidates[idx] for idx in top_sent_idx]
+                else:
+                    # out of time: lead sentence of each top passage, best passage first
+                    chosen = [s for s in sentences if s["lead"]][:summary_sentences]
                 
-                # deduplicate and format
-                seen = set()
-                lines = []
-                for s in chosen:
-                    key = s["sent"].lower()[:80] # check first 80 chars
-                    if key in seen:
-                        continue # continue to next item (key) in the loop
-                    seen.add(key)
-                    lines.append(f"{s['sent']} (Source: {s['url']})")
-                summary = " ".join(lines)
+                summary = format_summary(chosen)
+
+            cache_stats = cache_usage(pipeline_stats, embed_counter)
 
             elapsed = time.time() - start
+            self._report(progress, "done", 1.0, f"{elapsed:.1f}s")
             return {
                 "query": query,
                 "passages": top_passages_list,
                 "summary": summary,
                 "time": elapsed,
+                "pipeline": pipeline_stats,
+                "cache": cache_stats,
+                "http": self.http.stats(),
+                "embedding": self.embed_service.stats(),
+                "local_hits": local_hits,
+                "duplicates_removed": pipeline_stats["duplicates_removed"],
+                "cut_short": cut_short,
+                "partial": bool(cut_short),
+                "source": "local" if local_hits == len(top_passages_list) else ("mixed" if local_hits else "web"),
                 "params_used": {
                     "search_results": search_results,
                     "passages_per_page": passages_per_page,
                     "top_passages": top_passages,
                     "summary_sentences": summary_sentences,
-                    "timeout": timeout}   
+                    "timeout": timeout,
+                    "diversity": diversity,
+                    "early_stop_score": early_stop_score,
+                    "early_stop_count": early_stop_count,
+                    "local_first": local_first,
+                    "local_min_score": local_min_score,
+                    "local_max_age": local_max_age,
+                    "fetch_deadline": fetch_deadline,
+                    "dedup_threshold": dedup_threshold,
+                    "lexical_prefilter": lexical_prefilter,
+                    "deadline": deadline,
+                    "summary_candidates": summary_candidates}
             }
 
+    async def run_many(self, queries, search_results=DEFAULT_SEARCH_RESULTS,
+                       passages_per_page=DEFAULT_PASSAGES_PER_PAGE,
+                       top_passages=DEFAULT_TOP_PASSAGES,
+                       summary_sentences=DEFAULT_SUMMARY_SENTENCES,
+                       timeout=DEFAULT_TIMEOUT,
+                       diversity=None,
+                       fetch_deadline=DEFAULT_FETCH_DEADLINE,
+                       dedup_threshold=DEFAULT_DEDUP_THRESHOLD,
+                       lexical_prefilter=True,
+                       summary_candidates=DEFAULT_SUMMARY_CANDIDATES):
+        """
+        Research a list of related queries with shared work: one search per query,
+        URLs deduplicated across queries and each page fetched / chunked / embedded
+        once, then every query ranked against the union of passages with a single
+        (passages x queries) matrix product. Summary sentences for all queries are
+        embedded in one call. Returns {"results": [one run()-style result per input query,
+        in input order], ...}; repeated queries are researched once and share the result.
+        No local-knowledge lookup or early stop: the union serves every query.
+        Raises ValueError for blank queries.
+        """
+        start = time.time()
+        inputs = [q.strip() for q in queries]
+        if not all(inputs):
+            raise ValueError("queries must not be blank")
+        queries = list(dict.fromkeys(inputs))
+        if not queries:
+            return {"results": [], "time": 0.0}
+        embed_counter = {"hits": 0, "misses": 0}
+        q_embs = await self._embed(queries, embed_counter)
+
+        # one search per query, run concurrently; URLs in first-seen order
+        url_lists = await asyncio.gather(*[
+            search_web_async(q, max_results=search_results, providers=self.search_providers) for q in queries])
+        urls = list(dict.fromkeys(u for lst in url_lists for u in lst))
+        total_urls = sum(len(lst) for lst in url_lists)
+        print(f"Batch of {len(queries)} queries: {total_urls} URLs, {len(urls)} unique.")
+
+        docs, emb_txts, pipeline_stats = await self._stream_passages(
+            urls, q_embs[0], timeout, passages_per_page,
+            early_stop_score=None, early_stop_count=None,
+            embed_counter=embed_counter, fetch_deadline=fetch_deadline,
+            dedup_threshold=dedup_threshold,
+            query=queries if lexical_prefilter else None)
+
+        results = []
+        if docs:
+            # every passage against every query in one matmul
+            sims = normalize_rows(emb_txts) @ normalize_rows(q_embs).T
+            per_query = []
+            for j in range(len(queries)):
+                if diversity:
+                    idx = mmr(emb_txts, q_embs[j], top_passages, diversity=diversity, scores=sims[:, j])
+                else:
+                    idx = top_k(sims[:, j], top_passages)
+                per_query.append(idx)
+
+            # summary sentences of all queries, embedded together
+            sentence_lists = [prefilter_sentences(q, passage_sentences(docs, idx, sims[:, j]), summary_candidates)
+                              for j, (q, idx) in enumerate(zip(queries, per_query))]
+            sent_texts = list(dict.fromkeys(s["sent"] for lst in sentence_lists for s in lst))
+            sent_pos = {t: i for i, t in enumerate(sent_texts)}
+            sent_embs = await self._embed(sent_texts, embed_counter) if sent_texts else None
+
+            persist = {}
+            for j, (query, idx, sentences) in enumerate(zip(queries, per_query, sentence_lists)):
+                passages = [{"url": docs[i]["url"], "passage": docs[i]["passage"], "score": float(sims[i, j])}
+                            for i in idx]
+                for i, p in zip(idx, passages):
+                    persist.setdefault(int(i), {**p, "query": query})
+                if sentences:
+                    rows = sent_embs[[sent_pos[s["sent"]] for s in sentences]]
+                    top_sent_idx, _ = rank(rows, q_embs[j], summary_sentences, diversity=diversity)
+                    summary = format_summary([sentences[k] for k in top_sent_idx])
+                else:
+                    summary = "No summary could be generated"
+                results.append({"query": query, "passages": passages, "summary": summary})
+
+            # one batched write for every query's top passages
+            if persist:
+                keys = list(persist)
+                self._schedule_persist([persist[i] for i in keys], emb_txts[keys], queries[0])
+        else:
+            results = [{"query": q, "passages": [], "summary": "No content fetched."} for q in queries]
+
+        elapsed = time.time() - start
+        for r in results:
+            r["time"] = elapsed
+        by_query = dict(zip(queries, results))
+        return {
+            "results": [copy.deepcopy(by_query[q]) for q in inputs],
+            "time": elapsed,
+            "urls_total": total_urls,
+            "urls_unique": len(urls),
+            "pipeline": pipeline_stats,
+            "cache": cache_usage(pipeline_stats, embed_counter),
+            "http": self.http.stats(),
+            "embedding": self.embed_service.stats(),
+            "params_used": {
+                "search_results": search_results,
+                "passages_per_page": passages_per_page,
+                "top_passages": top_passages,
+                "summary_sentences": summary_sentences,
+                "timeout": timeout,
+                "diversity": diversity,
+                "fetch_deadline": fetch_deadline,
+                "dedup_threshold": dedup_threshold,
+                "lexical_prefilter": lexical_prefilter,
+                "summary_candidates": summary_candidates},
+        }
+
 # Helper functions (moved down, unchanged)
+def page_order(term_sets, texts):
+    """BM25 chunk order per query, interleaved rank by rank so every query gets its best chunks first."""
+    if len(term_sets) == 1:
+        return bm25_order(term_sets[0], texts)
+    orders = [bm25_order(terms, texts) for terms in term_sets]
+    seen, merged = set(), []
+    for ranked in zip(*orders):
+        for i in ranked:
+            if i not in seen:
+                seen.add(i)
+                merged.append(i)
+    return merged
+
+def passage_sentences(docs, top_idx, scores=None):
+    """
+    Sentences of the chosen passages, in passage rank order, tagged with source URL,
+    lead flag and (given passage scores) the score of the passage they came from.
+    """
+    sentences = []
+    for i in top_idx:
+        doc = docs[i]
+        # web passages reuse the sentence boundaries found while chunking
+        sents = doc["span"].sentences() if "span" in doc else split_sentences(doc["passage"])
+        passage_score = float(scores[i]) if scores is not None else 0.0
+        for j, s in enumerate(sents):
+            sentences.append({"sent": s, "url": doc["url"], "lead": j == 0, "passage_score": passage_score})
+    return sentences
+
+def prefilter_sentences(query, sentences, limit=DEFAULT_SUMMARY_CANDIDATES):
+    """
+    Keep the `limit` most promising sentences for dense scoring: BM25 against the
+    query (scaled to [0, 1]) plus the cosine score of the sentence's passage, so
+    sentences from strong passages survive even without exact term matches.
+    Original order is kept; below the limit every sentence passes.
+    """
+    if not limit or len(sentences) <= limit:
+        return sentences
+    lexical = bm25_scores(query_terms(query), [s["sent"] for s in sentences])
+    if lexical.max() > 0:
+        lexical = lexical / lexical.max()
+    prior = np.array([s.get("passage_score", 0.0) for s in sentences], dtype=np.float32)
+    keep = np.sort(top_k(lexical + prior, limit))
+    return [sentences[i] for i in keep]
+
+def format_summary(chosen):
+    """Deduplicate (first 80 chars) and format the chosen sentences with their sources."""
+    seen = set()
+    lines = []
+    for s in chosen:
+        key = s["sent"].lower()[:80] # check first 80 chars
+        if key in seen:
+            continue # continue to next item (key) in the loop
+        seen.add(key)
+        lines.append(f"{s['sent']} (Source: {s['url']})")
+    return " ".join(lines)
+
+def cache_usage(pipeline_stats, embed_counter):
+    page_cache_use = [p["cache"] for p in pipeline_stats["pages"]]
+    return {
+        "page_hits": page_cache_use.count("hit"),
+        "page_revalidated": page_cache_use.count("revalidated"),
+        "page_misses": page_cache_use.count("miss"),
+        "embed_hits": embed_counter["hits"],
+        "embed_misses": embed_counter["misses"],
+    }
+
+def passage_id(url, passage):
+    """Stable content-hash ID so the same passage is only ever stored once."""
+    digest = hashlib.blake2b(f"{url}\0{passage}".encode("utf-8"), digest_size=12).hexdigest()
+    return f"passage_{digest}"
+
 def chunk_passages(text, max_words=120, overlap=20):
     """Split long text into smaller passages."""
     words = text.split()
@@ -217,5 +761,7 @@ if __name__ == "__main__":
         # Test async run
         result = await agent.run("What causes urban heat islands and how can cities reduce them?")
         print(result["summary"])
+        await agent.aclose()
+        await agent.http.close()
         
     asyncio.run(main())
\ No newline at end of file
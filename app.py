@@ -7,9 +7,13 @@ import os
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage
 from graph_core.graph import graph
-from agent5_async import ShortResearchAgent
+from research_core.pool import ResearchAgentPool, set_research_pool, DEFAULT_POOL_SIZE
+from research_core.http import get_http_client
+from research_core.maintenance import maintenance_loop, DEFAULT_MAINTENANCE_INTERVAL
 from langchain_agent4 import AIAgent
+from contextlib import asynccontextmanager
 import uuid
+import asyncio
 
 
 ## FRONTEND
@@ -21,7 +25,28 @@ from fastapi.responses import FileResponse
 
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own a warm ShortResearchAgent pool for the lifetime of the server."""
+    pool = ResearchAgentPool(size=int(os.getenv("RESEARCH_POOL_SIZE", DEFAULT_POOL_SIZE)))
+    set_research_pool(pool)  # shared with graph_core.nodes.get_research_agent
+    app.state.research_pool = pool
+    # warm in the background: /health reports warming / ready / error, /research answers 503 until ready
+    warmup = pool.start_background()
+    # periodic TTL / dedupe / cap / compaction of the passage store (research_core/maintenance.py)
+    maintenance = None
+    if DEFAULT_MAINTENANCE_INTERVAL > 0:
+        maintenance = asyncio.create_task(maintenance_loop(lambda: pool.vector_store))
+    yield
+    warmup.cancel()
+    if maintenance is not None:
+        maintenance.cancel()
+    await pool.close()
+
+
 app = FastAPI(
+    lifespan=lifespan,
     title="Multi-Agent System API",
     description="Multi-Agent System with LangGraph, Semantic RAG, and Safe NL2SQL",
     version="1.0.0",
@@ -54,17 +79,32 @@ class ChatRequest(BaseModel):
     email: Optional[str] = None
     name: Optional[str] = "User"
     email_target: Optional[str] = None  # Expected payload values: 'raw_research', 'blog_post', 'db_results'
+    research_deadline: Optional[float] = None  # seconds per researcher_node run
     
 class ResearchRequest(BaseModel):
     query: str
     search_results: int = 20
+    deadline: Optional[float] = None  # seconds; partial results are returned when it runs out
     
 class ResearchResponse(BaseModel):
     query: str
     summary: str
     passages: List[dict]
     time: float
+    cut_short: List[str] = []  # pipeline stages stopped by the deadline
     
+class ResearchBatchRequest(BaseModel):
+    queries: List[str]
+    search_results: int = 20
+
+class ResearchBatchResponse(BaseModel):
+    results: List[ResearchResponse]
+    time: float
+    urls_total: int = 0
+    urls_unique: int = 0
+
+MAX_BATCH_QUERIES = int(os.getenv("RESEARCH_MAX_BATCH_QUERIES", "20"))
+
 class DBRequest(BaseModel):
     message: str
     working_dir: str =  "."
@@ -91,15 +131,48 @@ async def serve_dashboard():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "research_pool": app.state.research_pool.status(),
+        "research_http": get_http_client().stats(),
+    }
+
+def require_research_pool():
+    """503 while the research pool is still warming (or failed to start); see /health."""
+    pool = app.state.research_pool
+    if not pool.ready:
+        status = pool.status()
+        raise HTTPException(status_code=503, detail=f"research pool {status['state']}"
+                            + (f": {status['error']}" if status["error"] else ""))
+    return pool
 
-# Research endpoint using ShortResearchAgent from agent5_async.py
+# Research endpoint using the warm ShortResearchAgent pool from research_core/pool.py
 @app.post("/research", response_model=ResearchResponse)
 async def research_endpoint(req: ResearchRequest):
     """Semantic RAG research endpoint"""
-    agent = ShortResearchAgent()
-    result = await agent.run(query=req.query, search_results=req.search_results)
-    return ResearchResponse(**{k: result[k] for k in ["query", "summary", "passages", "time"]})
+    require_research_pool()
+    result = await app.state.research_pool.run(query=req.query, search_results=req.search_results,
+                                               deadline=req.deadline)
+    return ResearchResponse(**{k: result[k] for k in ["query", "summary", "passages", "time", "cut_short"] if k in result})
+
+# Batch research: related queries share search results, page fetches and one embedding pass
+@app.post("/research/batch", response_model=ResearchBatchResponse)
+async def research_batch_endpoint(req: ResearchBatchRequest):
+    """Semantic RAG research for a list of related queries"""
+    if not req.queries:
+        raise HTTPException(status_code=400, detail="queries must not be empty")
+    if len(req.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"at most {MAX_BATCH_QUERIES} queries per batch")
+    if not all(q.strip() for q in req.queries):
+        raise HTTPException(status_code=400, detail="queries must not be blank")
+    require_research_pool()
+    batch = await app.state.research_pool.run_many(req.queries, search_results=req.search_results)
+    return ResearchBatchResponse(
+        results=[ResearchResponse(**{k: r[k] for k in ["query", "summary", "passages", "time"]}) for r in batch["results"]],
+        time=batch["time"],
+        urls_total=batch.get("urls_total", 0),
+        urls_unique=batch.get("urls_unique", 0),
+    )
 
 # Full chat endpoint using LangGraph orchestrating the db and filesystem agent and the research agent
 @app.post("/chat")
@@ -130,7 +203,8 @@ async def chat_endpoint(req: ChatRequest):
                     "recipient_email": req.email,
                     "recipient_name": req.name,
                     "email_target_type": req.email_target,
-                    "email_sent_status": False
+                    "email_sent_status": False,
+                    "research_deadline": req.research_deadline,
                 } 
     #result = graph.invoke(inputs, config)
     result = await graph.ainvoke(inputs, config)
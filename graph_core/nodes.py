@@ -4,7 +4,7 @@ from typing import Optional
 from langchain_core.messages import HumanMessage, ToolMessage, AIMessage
 from graph_core.state import AgentState, DbQueryResult
 from langchain_agent5 import AIAgent
-from agent5_async import ShortResearchAgent
+from research_core.pool import get_research_pool
 from utils.llm_utils import get_resilient_llm
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from pydantic import BaseModel, Field
@@ -14,7 +14,7 @@ from email_service import send_pipeline_email
 import asyncio
 
 _agent = None
-_research_agent = None
+DEFAULT_RESEARCH_DEADLINE = float(os.getenv("RESEARCH_DEADLINE", "0")) or None  # seconds; unset = no budget
 
 # Helper Functions
 def get_agent(working_dir: str = "."):
@@ -25,11 +25,8 @@ def get_agent(working_dir: str = "."):
     return _agent
 
 def get_research_agent(working_dir: str = "."):
-    global _research_agent
-    if _research_agent is None:
-        print("Loading ShortResearchAgent and embedding model...")
-        _research_agent = ShortResearchAgent()
-    return _research_agent
+    # Shared warm pool (owned by the app lifespan when served); exposes the same run() signature
+    return get_research_pool()
 
 # DB and FILESYSTEM WORKER NODE
 def agent_node(state: AgentState) -> AgentState:
@@ -425,7 +422,9 @@ async def researcher_node(state: AgentState) -> AgentState:
     try:
         research_agent = get_research_agent()
         #clean await prevents prevents loop collision errors
-        research_output = await research_agent.run(topic)
+        research_output = await research_agent.run(topic, deadline=state.get("research_deadline") or DEFAULT_RESEARCH_DEADLINE)
+        if research_output.get("cut_short"):
+            print(f"Research cut short by deadline at: {', '.join(research_output['cut_short'])}")
         results = research_output.get("summary", "No summary could be generated.") # not sure this extra step is needed, but it allows us to control what we return to the supervisor and avoid overwhelming it with too much text
     except Exception as e:
         results = f"Error during semantic web research: {str(e)}"
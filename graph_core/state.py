@@ -20,6 +20,7 @@ class AgentState(TypedDict):
     topic: Optional[str] = None
     research_data: Annotated[List[str], "List of research findings"] = [] # A list of findings
     blog_post: Optional[str]  = None # The final output
+    research_deadline: Optional[float] = None  # seconds the researcher node may spend per run
    
     # --- ADDED FOR EMAIL ROUTING & TARGETING ---
     recipient_email: Optional[str] = None
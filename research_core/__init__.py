@@ -0,0 +1,2 @@
+# __init__.py
+__version__ = "0.1.0"
\ No newline at end of file
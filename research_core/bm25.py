@@ -0,0 +1,53 @@
+# research_core/bm25.py
+import re
+from collections import Counter
+import numpy as np
+
+DEFAULT_K1 = 1.5
+DEFAULT_B = 0.75
+
+_TOKEN_RE = re.compile(r"\w+")
+# only query-side words that carry no topic; passage text is never filtered
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how in is it of on or the to what when where which who why "
+    "will with".split()
+)
+
+
+def tokenize(text: str):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def query_terms(query: str):
+    """Distinct non-stopword query terms, in query order."""
+    terms = [t for t in tokenize(query) if t not in STOPWORDS]
+    return list(dict.fromkeys(terms))
+
+
+def bm25_scores(terms, texts, k1=DEFAULT_K1, b=DEFAULT_B) -> np.ndarray:
+    """
+    Okapi BM25 of each text against the query terms, with document frequencies
+    taken over `texts` themselves (the chunks of one page). Only query-term
+    frequencies are counted, so cost is one tokenize per chunk.
+    """
+    n = len(texts)
+    if not n or not terms:
+        return np.zeros(n, dtype=np.float32)
+    col = {t: j for j, t in enumerate(terms)}
+    tf = np.zeros((n, len(terms)), dtype=np.float32)
+    dl = np.empty(n, dtype=np.float32)
+    for i, text in enumerate(texts):
+        tokens = tokenize(text)
+        dl[i] = len(tokens)
+        for t, c in Counter(tok for tok in tokens if tok in col).items():
+            tf[i, col[t]] = c
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+    norm = k1 * (1 - b + b * dl / max(float(dl.mean()), 1.0))
+    return ((tf * (k1 + 1)) / (tf + norm[:, None])) @ idf
+
+
+def bm25_order(terms, texts):
+    """Indices of texts ordered by BM25 score; ties (e.g. no term hits) keep page order."""
+    scores = bm25_scores(terms, texts)
+    return np.argsort(-scores, kind="stable").tolist()
@@ -0,0 +1,96 @@
+# research_core/chunking.py
+import numpy as np
+
+_PERIOD, _BANG, _QUESTION = ord("."), ord("!"), ord("?")
+
+
+class TokenizedText:
+    """
+    One vectorized pass over a page's UTF-8 bytes: word start / end byte offsets
+    (int32) plus a flag for words ending in . ! or ?. Passages and sentences are
+    offset ranges into those bytes; text is only decoded when something reads it,
+    so a long page costs one bytes copy and a few small arrays instead of a word
+    list and a re-joined string per overlapping window.
+
+    Words are runs of non-ASCII-whitespace bytes; fetch_page_async text has
+    already had all unicode whitespace collapsed to single spaces.
+    """
+    __slots__ = ("data", "starts", "ends", "sent_end")
+
+    def __init__(self, text: str):
+        self.data = text.encode("utf-8")
+        b = np.frombuffer(self.data, dtype=np.uint8)
+        # in-place ops keep temporaries to one byte per input byte
+        is_word = b > 32
+        is_word |= b < 9
+        is_word |= (b > 13) & (b < 32)
+        is_word = is_word.view(np.int8)
+        # +1 where a word starts, -1 one past where it ends
+        edges = np.zeros(len(b) + 1, dtype=np.int8)
+        if len(b):
+            edges[0] = is_word[0]
+            np.subtract(is_word[1:], is_word[:-1], out=edges[1:-1])
+            edges[-1] = -is_word[-1]
+        self.starts = np.flatnonzero(edges == 1).astype(np.int32)
+        self.ends = np.flatnonzero(edges == -1).astype(np.int32)
+        last = b[self.ends - 1]
+        self.sent_end = (last == _PERIOD) | (last == _BANG) | (last == _QUESTION)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def slice(self, start: int, end: int) -> str:
+        return self.data[start:end].decode("utf-8")
+
+    def word_windows(self, max_words=120, overlap=20):
+        """(first_word, last_word_exclusive) windows, same stepping as chunk_passages."""
+        n = len(self.starts)
+        step = max_words - overlap
+        if step <= 0:
+            step = max(1, max_words - overlap // 2)
+        return [(i, min(i + max_words, n)) for i in range(0, n, step)]
+
+    def passages(self, max_words=120, overlap=20):
+        return [Passage(self, w0, w1) for w0, w1 in self.word_windows(max_words, overlap)]
+
+
+class Passage:
+    """A window of words of a TokenizedText. .text decodes the span on first access."""
+    __slots__ = ("source", "w0", "w1", "_text")
+
+    def __init__(self, source: TokenizedText, w0: int, w1: int):
+        self.source = source
+        self.w0 = w0
+        self.w1 = w1
+        self._text = None
+
+    @property
+    def span(self):
+        return int(self.source.starts[self.w0]), int(self.source.ends[self.w1 - 1])
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self.source.slice(*self.span)
+        return self._text
+
+    def sentence_spans(self):
+        """Sentence byte spans inside this passage from the precomputed boundaries."""
+        src = self.source
+        last_words = (np.flatnonzero(src.sent_end[self.w0:self.w1]) + self.w0).tolist()
+        if not last_words or last_words[-1] != self.w1 - 1:
+            last_words.append(self.w1 - 1)
+        spans, first = [], self.w0
+        for w in last_words:
+            spans.append((int(src.starts[first]), int(src.ends[w])))
+            first = w + 1
+        return spans
+
+    def sentences(self):
+        return [self.source.slice(s, e) for s, e in self.sentence_spans()]
+
+    def __str__(self):
+        return self.text
+
+    def __len__(self):
+        return self.w1 - self.w0
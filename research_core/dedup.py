@@ -0,0 +1,71 @@
+# research_core/dedup.py
+import numpy as np
+
+try:
+    import mmh3
+except ImportError:
+    mmh3 = None
+    import zlib
+
+DEFAULT_DEDUP_THRESHOLD = 0.8   # estimated Jaccard similarity of word shingles
+DEFAULT_NUM_PERM = 64
+DEFAULT_SHINGLE = 5
+DEFAULT_BANDS = 16
+
+_PRIME = np.uint64((1 << 61) - 1)
+
+
+def _hash32(s: str) -> int:
+    if mmh3 is not None:
+        return mmh3.hash(s, 0, signed=False)
+    return zlib.crc32(s.encode("utf-8"))
+
+
+class NearDuplicateFilter:
+    """
+    MinHash + LSH filter for syndicated / copied passages.
+    Each passage is reduced to a signature of num_perm minimum hashes over its
+    word shingles; LSH banding finds candidate matches and a passage is a
+    duplicate when its estimated Jaccard similarity to any passage seen
+    earlier is >= threshold. One instance per research run.
+    """
+
+    def __init__(self, threshold=DEFAULT_DEDUP_THRESHOLD, num_perm=DEFAULT_NUM_PERM,
+                 shingle=DEFAULT_SHINGLE, bands=DEFAULT_BANDS, seed=1):
+        self.threshold = threshold
+        self.shingle = shingle
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        # universal hashing (a * x + b) mod p gives num_perm independent permutations
+        self._a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+        self._buckets = [dict() for _ in range(bands)]
+        self._signatures = []
+        self.removed = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        words = text.lower().split()
+        k = self.shingle
+        shingles = {" ".join(words[i: i + k]) for i in range(max(1, len(words) - k + 1))}
+        hashes = np.fromiter((_hash32(s) for s in shingles), dtype=np.uint64, count=len(shingles))
+        perms = (hashes[:, None] * self._a + self._b) % _PRIME
+        return perms.min(axis=0).astype(np.uint32)
+
+    def seen(self, text: str) -> bool:
+        """True if text near-duplicates an earlier passage; otherwise remember it and return False."""
+        sig = self.signature(text)
+        band_keys = [sig[b * self.rows:(b + 1) * self.rows].tobytes() for b in range(self.bands)]
+        candidates = set()
+        for bucket, key in zip(self._buckets, band_keys):
+            candidates.update(bucket.get(key, ()))
+        for c in candidates:
+            if np.count_nonzero(self._signatures[c] == sig) / sig.size >= self.threshold:
+                self.removed += 1
+                return True
+
+        idx = len(self._signatures)
+        self._signatures.append(sig)
+        for bucket, key in zip(self._buckets, band_keys):
+            bucket.setdefault(key, []).append(idx)
+        return False
@@ -0,0 +1,203 @@
+# research_core/embed_cache.py
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import asyncio
+import threading
+from contextlib import contextmanager
+import numpy as np
+from research_core.page_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_EMBED_CACHE_SIZE = int(os.getenv("RESEARCH_EMBED_CACHE_SIZE", "50000"))  # vectors kept on disk
+DEFAULT_LOCK_TIMEOUT = 30.0   # seconds a process waits for another one's cache write
+
+
+def text_key(model_name: str, text: str) -> str:
+    """Cache key: model name + content hash, so switching models never returns stale vectors."""
+    return hashlib.blake2b(f"{model_name}\0{text}".encode("utf-8"), digest_size=16).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Content-hash embedding cache backed by a memory-mapped float32 matrix.
+    Each cached text owns one row ("slot") of the matrix; the key -> slot index
+    lives in a small SQLite file. When all slots are used the least recently
+    used key gives up its slot.
+    SQLite is the only record of which key owns a slot, so several processes
+    (uvicorn workers, the Streamlit app next to the API) can share one cache
+    directory: slots are allocated and written under an EXCLUSIVE transaction,
+    and lookups read the index and the rows under a shared read transaction.
+    """
+
+    def __init__(self, model_name: str, cache_dir: str = None, capacity: int = DEFAULT_EMBED_CACHE_SIZE):
+        self.model_name = model_name
+        self.capacity = capacity
+        cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        os.makedirs(cache_dir, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", model_name).strip("_")
+        self.vectors_path = os.path.join(cache_dir, f"embeddings_{slug}.f32")
+        self._lock = threading.Lock()
+        # autocommit: transactions are explicit. Rollback-journal mode (not WAL) so an
+        # EXCLUSIVE writer also keeps readers out while it rewrites matrix rows.
+        self._conn = sqlite3.connect(os.path.join(cache_dir, f"embeddings_{slug}.sqlite"),
+                                     timeout=DEFAULT_LOCK_TIMEOUT, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self.dim = None
+        self._matrix = None
+        self._touched = {}   # key -> last hit time, written with the next store()
+        with self._transaction("EXCLUSIVE"):
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS slots (key TEXT PRIMARY KEY, slot INTEGER UNIQUE, used_at REAL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS slots_used_at ON slots (used_at)")
+            cap = self._meta("capacity")
+            if cap is not None and int(cap) != capacity or not os.path.exists(self.vectors_path):
+                # capacity changed (or vectors missing): start over
+                self._conn.execute("DELETE FROM slots")
+                self._conn.execute("DELETE FROM meta")
+                if os.path.exists(self.vectors_path):
+                    os.remove(self.vectors_path)
+            self._sync_matrix()
+        self.hits = self.misses = 0
+
+    @contextmanager
+    def _transaction(self, mode=""):
+        self._conn.execute(f"BEGIN {mode}")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _meta(self, k):
+        row = self._conn.execute("SELECT v FROM meta WHERE k = ?", (k,)).fetchone()
+        return row[0] if row else None
+
+    def _sync_matrix(self):
+        """Open the matrix if another process (or an earlier run) created it."""
+        if self._matrix is None:
+            dim = self._meta("dim")
+            if dim is not None and os.path.exists(self.vectors_path):
+                self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r+",
+                                         shape=(self.capacity, int(dim)))
+                self.dim = int(dim)
+
+    def _create_matrix(self, dim: int):
+        self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="w+", shape=(self.capacity, dim))
+        self.dim = dim
+        self._conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                               [("dim", str(dim)), ("capacity", str(self.capacity))])
+
+    def lookup(self, texts):
+        """Returns (keys, {position: vector}) for the texts already cached."""
+        keys = [text_key(self.model_name, t) for t in texts]
+        found = {}
+        if not keys:
+            return keys, found
+        now = time.time()
+        with self._lock, self._transaction():
+            self._sync_matrix()
+            if self._matrix is None:
+                return keys, found
+            slots = {}
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                slots.update(self._conn.execute(
+                    f"SELECT key, slot FROM slots WHERE key IN ({','.join('?' * len(part))})", part).fetchall())
+            for i, k in enumerate(keys):
+                slot = slots.get(k)
+                if slot is not None:
+                    found[i] = np.array(self._matrix[slot])
+                    self._touched[k] = now
+        return keys, found
+
+    def _allocate(self, keys):
+        """key -> slot for every key; runs inside the EXCLUSIVE transaction of store()."""
+        owned = {}
+        for i in range(0, len(keys), 500):
+            part = keys[i:i + 500]
+            owned.update(self._conn.execute(
+                f"SELECT key, slot FROM slots WHERE key IN ({','.join('?' * len(part))})", part).fetchall())
+        new = [k for k in keys if k not in owned]
+        used = self._conn.execute("SELECT COUNT(*) FROM slots").fetchone()[0]
+        fresh = list(range(used, min(self.capacity, used + len(new))))
+        need = len(new) - len(fresh)
+        if need > 0:
+            # least recently used slots not claimed by this batch
+            victims = self._conn.execute("SELECT key, slot FROM slots ORDER BY used_at ASC LIMIT ?",
+                                         (need + len(owned),)).fetchall()
+            victims = [(k, slot) for k, slot in victims if k not in owned][:need]
+            self._conn.executemany("DELETE FROM slots WHERE key = ?", [(k,) for k, _ in victims])
+            fresh += [slot for _, slot in victims]
+        owned.update(zip(new, fresh))
+        return owned
+
+    def store(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        # a batch larger than the cache keeps its last `capacity` vectors
+        keys, vectors = list(keys)[-self.capacity:], vectors[-self.capacity:]
+        if not keys:
+            return
+        now = time.time()
+        with self._lock, self._transaction("EXCLUSIVE"):
+            self._sync_matrix()
+            if self._matrix is None:
+                self._create_matrix(vectors.shape[1])
+            # hits since the last write count for the LRU order before choosing victims
+            touched, self._touched = self._touched, {}
+            self._conn.executemany("UPDATE slots SET used_at = ? WHERE key = ? AND used_at < ?",
+                                   [(t, k, t) for k, t in touched.items()])
+            slots = self._allocate(keys)
+            rows = []
+            for k, vec in zip(keys, vectors):
+                self._matrix[slots[k]] = vec
+                rows.append((k, slots[k], now))
+            self._matrix.flush()
+            self._conn.executemany("INSERT OR REPLACE INTO slots VALUES (?, ?, ?)", rows)
+
+    async def aencode(self, texts, encode_fn, counter: dict = None):
+        """
+        Embed texts, sending only uncached (and de-duplicated) texts to `encode_fn`,
+        an async callable returning a 2-D array. Optional counter gets hits / misses.
+        """
+        keys, found = await asyncio.to_thread(self.lookup, texts)   # may wait on another process's write lock
+        missing = {}
+        for i, k in enumerate(keys):
+            if i not in found:
+                missing.setdefault(k, []).append(i)
+
+        if missing:
+            miss_texts = [texts[positions[0]] for positions in missing.values()]
+            new_vecs = np.asarray(await encode_fn(miss_texts), dtype=np.float32)
+            for vec, positions in zip(new_vecs, missing.values()):
+                for i in positions:
+                    found[i] = vec
+            await asyncio.to_thread(self.store, list(missing), new_vecs)
+
+        n_miss = sum(len(p) for p in missing.values())
+        self.hits += len(texts) - n_miss
+        self.misses += n_miss
+        if counter is not None:
+            counter["hits"] = counter.get("hits", 0) + len(texts) - n_miss
+            counter["misses"] = counter.get("misses", 0) + n_miss
+        if not texts:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return np.vstack([found[i] for i in range(len(texts))])
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM slots").fetchone()[0]
+        return {"entries": entries, "capacity": self.capacity, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            if self._touched:
+                with self._transaction("IMMEDIATE"):
+                    self._conn.executemany("UPDATE slots SET used_at = ? WHERE key = ? AND used_at < ?",
+                                           [(t, k, t) for k, t in self._touched.items()])
+                self._touched = {}
+            if self._matrix is not None:
+                self._matrix.flush()
+            self._conn.close()
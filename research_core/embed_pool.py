@@ -0,0 +1,92 @@
+# research_core/embed_pool.py
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from research_core.embedders import load_embedder, DEFAULT_EMBED_BACKEND
+
+DEFAULT_EMBED_PROCESSES = int(os.getenv("RESEARCH_EMBED_PROCESSES", "0"))           # 0 = in-process only
+DEFAULT_MP_THRESHOLD = int(os.getenv("RESEARCH_EMBED_MP_THRESHOLD", "128"))         # texts per encode job
+DEFAULT_MP_CHUNK = 64
+
+_worker_embedder = None
+
+
+def _init_worker(loader, model_name, backend, threads):
+    """Runs once per worker process: pin intra-op threads (torch and onnxruntime), then load the model."""
+    global _worker_embedder
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_embedder = loader(model_name, backend, num_threads=threads)
+
+
+def _encode_chunk(texts, batch_size):
+    embs = _worker_embedder.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    return np.asarray(embs, dtype=np.float32)
+
+
+class MultiProcessEmbedder:
+    """
+    Persistent pool of worker processes, each holding its own copy of the model,
+    for encode jobs too large for one core. A job is cut into length-sorted chunks
+    spread over the workers and reassembled into one contiguous float32 array in
+    the caller's order. Works for every backend load_embedder knows.
+    Memory cost is one model per process.
+    """
+
+    def __init__(self, model_name, backend=DEFAULT_EMBED_BACKEND, processes=DEFAULT_EMBED_PROCESSES,
+                 chunk_size=DEFAULT_MP_CHUNK, loader=load_embedder):
+        self.model_name = model_name
+        self.backend = backend
+        self.processes = max(1, processes)
+        self.chunk_size = chunk_size
+        self.loader = loader
+        self._pool = None
+        self.jobs = self.texts = 0
+
+    def _ensure_pool(self):
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.processes)
+            # spawn: the parent holds torch / tokenizer threads that are unsafe to fork
+            ctx = multiprocessing.get_context("spawn")
+            self._pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=ctx, initializer=_init_worker,
+                                             initargs=(self.loader, self.model_name, self.backend, threads))
+        return self._pool
+
+    def encode(self, texts, batch_size=32, **kwargs) -> np.ndarray:
+        """SentenceTransformer-style encode; blocks until every chunk is back."""
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        pool = self._ensure_pool()
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))   # similar lengths share a chunk
+        # at least one chunk per worker, never more than chunk_size texts per chunk
+        size = max(1, min(self.chunk_size, -(-len(texts) // self.processes)))
+        parts = [order[i:i + size] for i in range(0, len(order), size)]
+        futures = [pool.submit(_encode_chunk, [texts[i] for i in part], batch_size) for part in parts]
+        out = None
+        for part, fut in zip(parts, futures):
+            embs = fut.result()
+            if out is None:
+                out = np.empty((len(texts), embs.shape[1]), dtype=np.float32)
+            out[part] = embs
+        self.jobs += 1
+        self.texts += len(texts)
+        return out
+
+    def warm(self):
+        """Start every worker and load its model now rather than on the first large job."""
+        pool = self._ensure_pool()
+        for fut in [pool.submit(_encode_chunk, ["warm"], 1) for _ in range(self.processes)]:
+            fut.result()
+
+    def stats(self) -> dict:
+        return {"processes": self.processes, "jobs": self.jobs, "texts": self.texts}
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
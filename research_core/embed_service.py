@@ -0,0 +1,154 @@
+# research_core/embed_service.py
+import os
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from research_core.embed_pool import DEFAULT_MP_THRESHOLD
+
+DEFAULT_MAX_BATCH = int(os.getenv("RESEARCH_EMBED_MAX_BATCH", "64"))
+DEFAULT_MAX_WAIT_MS = float(os.getenv("RESEARCH_EMBED_MAX_WAIT_MS", "8"))
+DEFAULT_EMBED_THREADS = int(os.getenv("RESEARCH_EMBED_THREADS", str(min(4, os.cpu_count() or 1))))
+
+_STOP = object()
+
+
+class EmbeddingService:
+    """
+    Cross-request dynamic micro-batcher in front of one embedder.
+    Callers on any event loop queue texts; a dedicated thread flushes the queue
+    as one encode call when max_batch texts are waiting or max_wait_ms has
+    passed since the first one arrived. Texts are sorted by length inside the
+    batch to cut padding, and torch intra-op threads are pinned to num_threads
+    so concurrent runs do not oversubscribe the CPU (onnxruntime embedders get
+    the same count at load time: load_embedder(..., num_threads=)).
+    With an mp_embedder (research_core/embed_pool.py), batches of at least
+    mp_threshold texts go to its worker processes while the service thread
+    keeps encoding small batches in-process.
+    """
+
+    def __init__(self, embedder, max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS,
+                 num_threads=DEFAULT_EMBED_THREADS, mp_embedder=None, mp_threshold=DEFAULT_MP_THRESHOLD):
+        self.embedder = embedder
+        self.mp_embedder = mp_embedder
+        self.mp_threshold = mp_threshold
+        self._mp_dispatch = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-mp") if mp_embedder else None
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.num_threads = num_threads
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.counters = {"requests": 0, "batches": 0, "texts": 0, "mp_batches": 0}
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name="embedding-service", daemon=True)
+                self._thread.start()
+        return self
+
+    async def encode(self, texts) -> np.ndarray:
+        """Returns a (len(texts), dim) float32 array."""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        self.start()
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._queue.put((list(texts), fut, loop))
+        return await fut
+
+    def _collect(self, first):
+        """Block until the batch is full or the latency window closes."""
+        batch, total = [first], len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while total < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+            total += len(item[0])
+        return batch
+
+    def _worker(self):
+        try:
+            import torch
+            torch.set_num_threads(self.num_threads)
+        except ImportError:
+            pass
+
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = self._collect(first)
+            texts = [t for req in batch for t in req[0]]
+            if self._mp_dispatch is not None and len(texts) >= self.mp_threshold:
+                # large job: worker processes, without holding up the small ones queued behind it
+                self.counters["mp_batches"] += 1
+                self._mp_dispatch.submit(self._run_batch, self.mp_embedder, batch, texts)
+            else:
+                self._run_batch(self.embedder, batch, texts)
+
+    def _run_batch(self, embedder, batch, texts):
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))   # length bucketing
+        try:
+            sorted_embs = embedder.encode([texts[i] for i in order], batch_size=self.max_batch,
+                                          convert_to_numpy=True, show_progress_bar=False)
+            embs = np.empty_like(np.asarray(sorted_embs, dtype=np.float32))
+            embs[order] = sorted_embs
+            error = None
+        except Exception as e:
+            embs, error = None, e
+
+        self.counters["requests"] += len(batch)
+        self.counters["batches"] += 1
+        self.counters["texts"] += len(texts)
+        offset = 0
+        for req_texts, fut, loop in batch:
+            n = len(req_texts)
+            payload = error if error is not None else embs[offset: offset + n]
+            offset += n
+            try:
+                loop.call_soon_threadsafe(_resolve, fut, payload)
+            except RuntimeError:
+                pass  # caller's loop already closed
+
+    def stats(self) -> dict:
+        c = dict(self.counters)
+        c["avg_batch"] = round(c["texts"] / c["batches"], 1) if c["batches"] else 0.0
+        c["queued"] = self._queue.qsize()
+        if self.mp_embedder is not None:
+            c["mp"] = self.mp_embedder.stats()
+        return c
+
+    def warm(self):
+        if self.mp_embedder is not None:
+            self.mp_embedder.warm()
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout=5)
+        self._thread = None
+        if self.mp_embedder is not None:
+            self._mp_dispatch.shutdown(wait=False)
+            self.mp_embedder.close()
+
+
+def _resolve(fut, payload):
+    if fut.done():
+        return
+    if isinstance(payload, Exception):
+        fut.set_exception(payload)
+    else:
+        fut.set_result(payload)
@@ -0,0 +1,106 @@
+# research_core/embedders.py
+import os
+import numpy as np
+from research_core.page_cache import DEFAULT_CACHE_DIR
+
+EMBED_BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_EMBED_BACKEND = os.getenv("RESEARCH_EMBED_BACKEND", "torch")
+DEFAULT_ONNX_DIR = os.path.join(DEFAULT_CACHE_DIR, "onnx")
+DEFAULT_MAX_SEQ_LENGTH = 256   # all-MiniLM-L6-v2 max_seq_length
+
+
+class OnnxEmbedder:
+    """
+    SentenceTransformer-compatible encoder running the same transformer through onnxruntime.
+    The model is exported once (needs torch) and cached under onnx_dir; with quantize=True a
+    dynamic int8 copy is produced next to it. Pooling matches all-MiniLM-L6-v2:
+    attention-masked mean pooling followed by L2 normalisation.
+    """
+
+    def __init__(self, model_name, quantize=False, onnx_dir=DEFAULT_ONNX_DIR,
+                 max_seq_length=DEFAULT_MAX_SEQ_LENGTH, num_threads=None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.quantize = quantize
+        self.max_seq_length = max_seq_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model_dir = os.path.join(onnx_dir, model_name.replace("/", "__"))
+        path = self._ensure_model()
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            opts.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self._dim = None
+
+    def _ensure_model(self):
+        os.makedirs(self.model_dir, exist_ok=True)
+        fp32_path = os.path.join(self.model_dir, "model.onnx")
+        if not os.path.exists(fp32_path):
+            self._export(fp32_path)
+        if not self.quantize:
+            return fp32_path
+        int8_path = os.path.join(self.model_dir, "model.int8.onnx")
+        if not os.path.exists(int8_path):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            print(f"Quantizing {self.model_name} to int8...")
+            quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        return int8_path
+
+    def _export(self, path):
+        import torch
+        from transformers import AutoModel
+        print(f"Exporting {self.model_name} to ONNX (one-off)...")
+        model = AutoModel.from_pretrained(self.model_name).eval()
+        dummy = self.tokenizer(["export sample"], return_tensors="pt")
+        names = ["input_ids", "attention_mask", "token_type_ids"]
+        axes = {n: {0: "batch", 1: "seq"} for n in names}
+        axes["last_hidden_state"] = {0: "batch", 1: "seq"}
+        with torch.no_grad():
+            torch.onnx.export(
+                model, tuple(dummy[n] for n in names), path,
+                input_names=names, output_names=["last_hidden_state"],
+                dynamic_axes=axes, opset_version=14,
+            )
+
+    def get_sentence_embedding_dimension(self):
+        if self._dim is None:
+            self._dim = int(self.encode(["dimension probe"]).shape[1])
+        return self._dim
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, show_progress_bar=False,
+               normalize_embeddings=True, **kwargs):
+        """Same call shape as SentenceTransformer.encode; returns float32 numpy arrays."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        out = []
+        for i in range(0, len(texts), batch_size):
+            enc = self.tokenizer(texts[i: i + batch_size], padding=True, truncation=True,
+                                 max_length=self.max_seq_length, return_tensors="np")
+            feed = {k: v.astype(np.int64) for k, v in enc.items() if k in self._input_names}
+            hidden = self.session.run(None, feed)[0]
+            mask = enc["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            if normalize_embeddings:
+                pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            out.append(pooled.astype(np.float32))
+        embs = np.vstack(out) if out else np.empty((0, 0), dtype=np.float32)
+        return embs[0] if single else embs
+
+
+def load_embedder(model_name, backend=DEFAULT_EMBED_BACKEND, num_threads=None):
+    """
+    torch (SentenceTransformer), onnx, or onnx-int8. All expose .encode().
+    num_threads caps onnxruntime's intra-op threads (None = every core); torch's
+    process-wide pool is pinned by whoever runs the encodes (EmbeddingService, pool workers).
+    """
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEmbedder(model_name, quantize=backend == "onnx-int8", num_threads=num_threads)
+    raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {EMBED_BACKENDS}")
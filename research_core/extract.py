@@ -0,0 +1,96 @@
+# research_core/extract.py
+import os
+import re
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import lxml  # noqa: F401  (lxml-backed BeautifulSoup tree builder is several times faster)
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+DEFAULT_EXTRACT_WORKERS = int(os.getenv("RESEARCH_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+DEFAULT_MAX_HTML_CHARS = 1_500_000   # pages beyond this are truncated before parsing
+STRIP_TAGS = ["script", "style", "noscript", "header", "footer", "svg", "iframe", "nav", "aside"]
+
+_WS = re.compile(r"\s+")
+
+
+def extract_text(html: str, max_chars: int = DEFAULT_MAX_HTML_CHARS):
+    """
+    HTML -> cleaned paragraph text. Runs inside a worker process.
+    Returns (text, elapsed_ms).
+    """
+    from bs4 import BeautifulSoup
+    t0 = time.perf_counter()
+    if max_chars and len(html) > max_chars:
+        html = html[:max_chars]
+    soup = BeautifulSoup(html, HTML_PARSER)
+    for tag in soup(STRIP_TAGS):
+        tag.extract()
+    paragraphs = [p.get_text(" ", strip=True) for p in soup.find_all("p")]
+    content = " ".join(p for p in paragraphs if p)
+    cleaned = _WS.sub(" ", content).strip()
+    return cleaned, (time.perf_counter() - t0) * 1000
+
+
+class HtmlExtractor:
+    """
+    Bounded process pool for HTML extraction so parsing never runs on the
+    event loop thread or contends for the GIL with concurrent fetches.
+    At most workers * 2 pages are queued; callers wait for a slot.
+    """
+
+    def __init__(self, workers: int = DEFAULT_EXTRACT_WORKERS, max_chars: int = DEFAULT_MAX_HTML_CHARS):
+        self.workers = max(1, workers)
+        self.max_chars = max_chars
+        self._pool = None
+        self._slots = None
+        self._loop = None
+
+    def _ensure_pool(self):
+        if self._pool is None:
+            # spawn: the parent may hold torch / tokenizer threads that are unsafe to fork
+            ctx = multiprocessing.get_context("spawn")
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx)
+        # the semaphore binds to the loop it is first awaited on (asyncio.run per script call)
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._slots = asyncio.Semaphore(self.workers * 2)
+            self._loop = loop
+
+    async def extract(self, html: str):
+        """Returns (text, elapsed_ms) measured inside the worker."""
+        self._ensure_pool()
+        loop = asyncio.get_running_loop()
+        async with self._slots:
+            try:
+                return await loop.run_in_executor(self._pool, extract_text, html, self.max_chars)
+            except BrokenProcessPool:
+                print("Extractor pool broke, restarting and parsing this page in a thread")
+                self._pool = None
+                return await asyncio.to_thread(extract_text, html, self.max_chars)
+
+    async def warm(self):
+        """Start the worker processes now rather than on the first page."""
+        await asyncio.gather(*[self.extract("<p>warm</p>") for _ in range(self.workers)])
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+_extractor = None
+
+
+def get_extractor() -> HtmlExtractor:
+    """Process-wide extractor shared by every research agent."""
+    global _extractor
+    if _extractor is None:
+        _extractor = HtmlExtractor()
+    return _extractor
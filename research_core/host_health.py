@@ -0,0 +1,155 @@
+# research_core/host_health.py
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+import urllib.parse
+from collections import deque
+import numpy as np
+from research_core.page_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_LATENCY_WINDOW = 50         # recent successful fetch latencies kept per host
+DEFAULT_MIN_SAMPLES = 3             # below this the caller's fixed timeout is used
+DEFAULT_TIMEOUT_MARGIN = 1.5        # timeout = p95 * margin, clamped to [min_timeout, caller timeout]
+DEFAULT_MIN_TIMEOUT = 3.0
+DEFAULT_FAIL_THRESHOLD = 2          # consecutive failures before a host is skipped
+DEFAULT_BACKOFF = 15 * 60           # first skip window (seconds); doubles per further failure
+DEFAULT_MAX_BACKOFF = 24 * 3600
+DEFAULT_FORGET_AFTER = 30 * 24 * 3600  # hosts not seen for this long are dropped on load
+
+# responses that say "this host will not serve us", as opposed to a missing page
+FAILURE_STATUSES = frozenset({401, 403, 407, 429, 451})
+
+
+def host_of(url: str) -> str:
+    return (urllib.parse.urlsplit(url).hostname or "").lower()
+
+
+class _Host:
+    __slots__ = ("latencies", "ok", "failed", "consecutive_failures", "last_failure", "last_status", "seen_at")
+
+    def __init__(self, window):
+        self.latencies = deque(maxlen=window)
+        self.ok = self.failed = self.consecutive_failures = 0
+        self.last_failure = 0.0
+        self.last_status = None
+        self.seen_at = 0.0
+
+    def to_json(self) -> str:
+        return json.dumps({"latencies": list(self.latencies), "ok": self.ok, "failed": self.failed,
+                           "consecutive_failures": self.consecutive_failures,
+                           "last_failure": self.last_failure, "last_status": self.last_status,
+                           "seen_at": self.seen_at})
+
+    @classmethod
+    def from_json(cls, body: str, window):
+        d = json.loads(body)
+        h = cls(window)
+        h.latencies.extend(d["latencies"])
+        h.ok, h.failed = d["ok"], d["failed"]
+        h.consecutive_failures, h.last_failure = d["consecutive_failures"], d["last_failure"]
+        h.last_status, h.seen_at = d["last_status"], d["seen_at"]
+        return h
+
+
+class HostHealthRegistry:
+    """
+    Per-host fetch history: recent latencies, failure counts and a backoff window.
+    Hosts that keep failing (timeouts, connection errors, 401/403/429...) are skipped
+    until their backoff expires, and hosts with enough history get a timeout derived
+    from their p95 latency instead of the fixed default. State lives in memory and is
+    written to SQLite by flush() so it survives restarts.
+    """
+
+    def __init__(self, path: str = None, window: int = DEFAULT_LATENCY_WINDOW,
+                 fail_threshold: int = DEFAULT_FAIL_THRESHOLD, backoff: float = DEFAULT_BACKOFF):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "hosts.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.window = window
+        self.fail_threshold = fail_threshold
+        self.backoff = backoff
+        self._lock = threading.Lock()
+        self._hosts = {}
+        self._dirty = set()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS hosts (host TEXT PRIMARY KEY, body TEXT, seen_at REAL)")
+        self._conn.execute("DELETE FROM hosts WHERE seen_at < ?", (time.time() - DEFAULT_FORGET_AFTER,))
+        self._conn.commit()
+        for host, body in self._conn.execute("SELECT host, body FROM hosts"):
+            self._hosts[host] = _Host.from_json(body, window)
+        self.skipped = 0
+
+    def _host(self, host):
+        h = self._hosts.get(host)
+        if h is None:
+            h = self._hosts[host] = _Host(self.window)
+        return h
+
+    def skip_until(self, url: str) -> float:
+        """Epoch seconds until which the host is being skipped (0 if it is not)."""
+        h = self._hosts.get(host_of(url))
+        if h is None or h.consecutive_failures < self.fail_threshold:
+            return 0.0
+        wait = min(self.backoff * 2 ** (h.consecutive_failures - self.fail_threshold), DEFAULT_MAX_BACKOFF)
+        return h.last_failure + wait
+
+    def should_skip(self, url: str) -> bool:
+        skip = self.skip_until(url) > time.time()
+        if skip:
+            self.skipped += 1
+        return skip
+
+    def timeout_for(self, url: str, default: float) -> float:
+        """p95 latency * margin once the host has history, never above the caller's timeout."""
+        h = self._hosts.get(host_of(url))
+        if h is None or len(h.latencies) < DEFAULT_MIN_SAMPLES:
+            return default
+        p95 = float(np.percentile(np.fromiter(h.latencies, dtype=np.float64), 95))
+        return min(default, max(DEFAULT_MIN_TIMEOUT, p95 * DEFAULT_TIMEOUT_MARGIN))
+
+    def record_success(self, url: str, latency: float, status: int = 200):
+        host = host_of(url)
+        with self._lock:
+            h = self._host(host)
+            h.latencies.append(round(latency, 4))
+            h.ok += 1
+            h.consecutive_failures = 0
+            h.last_status = status
+            h.seen_at = time.time()
+            self._dirty.add(host)
+
+    def record_failure(self, url: str, status=None):
+        """status: HTTP status, or an exception name for timeouts / connection errors."""
+        host = host_of(url)
+        with self._lock:
+            h = self._host(host)
+            h.failed += 1
+            h.consecutive_failures += 1
+            h.last_status = status
+            h.last_failure = h.seen_at = time.time()
+            self._dirty.add(host)
+
+    def flush(self):
+        with self._lock:
+            rows = [(host, self._hosts[host].to_json(), self._hosts[host].seen_at) for host in self._dirty]
+            self._dirty.clear()
+            if rows:
+                self._conn.executemany("INSERT OR REPLACE INTO hosts VALUES (?, ?, ?)", rows)
+                self._conn.commit()
+
+    async def aflush(self):
+        await asyncio.to_thread(self.flush)
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            hosts = list(self._hosts)
+        backing_off = sum(1 for host in hosts if self.skip_until(f"//{host}") > now)
+        return {"hosts": len(hosts), "backing_off": backing_off, "skipped": self.skipped}
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,126 @@
+# research_core/http.py
+import os
+import time
+import codecs
+import asyncio
+import aiohttp
+
+DEFAULT_CONN_LIMIT = int(os.getenv("RESEARCH_HTTP_LIMIT", "64"))                 # sockets overall
+DEFAULT_CONN_LIMIT_PER_HOST = int(os.getenv("RESEARCH_HTTP_LIMIT_PER_HOST", "4"))  # sockets per host
+DEFAULT_DNS_TTL = 300                                                              # seconds
+DEFAULT_MAX_BODY_BYTES = int(os.getenv("RESEARCH_MAX_BODY_BYTES", str(2 * 1024**2)))  # per page
+DEFAULT_READ_CHUNK = 64 * 1024
+TEXT_CONTENT_TYPES = ("html", "text")
+
+
+def is_text_response(resp) -> bool:
+    """Header-only check, so PDFs and binaries are rejected before any body is read."""
+    ct = resp.headers.get("content-type", "").lower()
+    return any(x in ct for x in TEXT_CONTENT_TYPES)
+
+
+async def read_text_capped(resp, max_bytes=DEFAULT_MAX_BODY_BYTES, chunk_size=DEFAULT_READ_CHUNK):
+    """
+    Read and decode the body chunk by chunk, stopping after max_bytes.
+    An incremental decoder handles multi-byte characters split across chunks,
+    so a huge page never sits in memory as one bytes object plus its str copy.
+    Returns (text, truncated).
+    """
+    try:
+        decoder = codecs.getincrementaldecoder(resp.charset or "utf-8")(errors="replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parts, read, truncated = [], 0, False
+    async for chunk in resp.content.iter_chunked(chunk_size):
+        if read + len(chunk) >= max_bytes:
+            truncated = read + len(chunk) > max_bytes or not resp.content.at_eof()
+            chunk = chunk[:max_bytes - read]
+            parts.append(decoder.decode(chunk))
+            break
+        read += len(chunk)
+        parts.append(decoder.decode(chunk))
+    # a character cut at the cap is dropped rather than replaced
+    parts.append(decoder.decode(b"", final=not truncated))
+    return "".join(parts), truncated
+
+
+class HttpClient:
+    """
+    One long-lived aiohttp session per process (per event loop) so keep-alive
+    connections, TLS sessions and DNS lookups survive across research runs.
+    Connection reuse is counted with aiohttp trace hooks. A request made with a
+    dict as trace_request_ctx gets "request_at" and, once it holds a socket
+    (new or reused), "socket_at" perf_counter stamps, so callers can tell time
+    spent queueing for a per-host slot from time spent on the host itself.
+    """
+
+    def __init__(self, limit=DEFAULT_CONN_LIMIT, limit_per_host=DEFAULT_CONN_LIMIT_PER_HOST, dns_ttl=DEFAULT_DNS_TTL):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self._session = None
+        self._loop = None
+        self.counters = {"requests": 0, "connections_created": 0, "connections_reused": 0,
+                         "dns_cache_hits": 0, "dns_cache_misses": 0, "sessions_created": 0}
+
+    def _trace_config(self):
+        trace = aiohttp.TraceConfig()
+
+        def bump(name):
+            async def _hook(session, ctx, params):
+                self.counters[name] += 1
+            return _hook
+
+        def stamp(name):
+            async def _hook(session, ctx, params):
+                if isinstance(ctx.trace_request_ctx, dict):
+                    ctx.trace_request_ctx.setdefault(name, time.perf_counter())
+            return _hook
+
+        trace.on_request_start.append(bump("requests"))
+        trace.on_request_start.append(stamp("request_at"))
+        trace.on_connection_create_start.append(stamp("socket_at"))
+        trace.on_connection_reuseconn.append(stamp("socket_at"))
+        trace.on_connection_create_end.append(bump("connections_created"))
+        trace.on_connection_reuseconn.append(bump("connections_reused"))
+        trace.on_dns_cache_hit.append(bump("dns_cache_hits"))
+        trace.on_dns_cache_miss.append(bump("dns_cache_misses"))
+        return trace
+
+    def session(self) -> aiohttp.ClientSession:
+        """Shared session for the running loop; rebuilt if closed or used from a new loop."""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_ttl,
+                enable_cleanup_closed=True,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, trace_configs=[self._trace_config()])
+            self._loop = loop
+            self.counters["sessions_created"] += 1
+        return self._session
+
+    def stats(self) -> dict:
+        c = dict(self.counters)
+        opened = c["connections_created"] + c["connections_reused"]
+        c["reuse_ratio"] = round(c["connections_reused"] / opened, 3) if opened else 0.0
+        return c
+
+    async def close(self):
+        if self._session is not None and not self._session.closed and self._loop is asyncio.get_running_loop():
+            await self._session.close()
+        self._session = None
+
+
+_client = None
+
+
+def get_http_client() -> HttpClient:
+    """Process-wide client shared by every research agent."""
+    global _client
+    if _client is None:
+        _client = HttpClient()
+    return _client
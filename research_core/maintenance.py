@@ -0,0 +1,127 @@
+# research_core/maintenance.py
+"""
+Retention for the research passage store.
+
+    python -m research_core.maintenance --backend mmap --ttl-days 30 --max-count 100000 --max-mb 512
+    python -m research_core.maintenance --dry-run
+
+The app also runs it in the background every RESEARCH_MAINTENANCE_INTERVAL seconds.
+The CLI is safe to run while the app is up: the mmap store serialises writers with a
+file lock and the app remaps after a compaction made by another process.
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+from research_core.vector_store import open_vector_store, VECTOR_STORES, DEFAULT_VECTOR_STORE
+
+DEFAULT_PASSAGE_TTL = float(os.getenv("RESEARCH_PASSAGE_TTL_DAYS", "30")) * 86400   # seconds
+DEFAULT_MAX_PASSAGES = int(os.getenv("RESEARCH_MAX_PASSAGES", "200000"))
+DEFAULT_MAX_STORE_BYTES = int(float(os.getenv("RESEARCH_MAX_STORE_MB", "1024")) * 1024**2)
+DEFAULT_MAINTENANCE_INTERVAL = float(os.getenv("RESEARCH_MAINTENANCE_INTERVAL", str(6 * 3600)))  # 0 disables
+
+
+def plan_evictions(entries, now, ttl=DEFAULT_PASSAGE_TTL, max_count=DEFAULT_MAX_PASSAGES, bytes_per_entry=0.0,
+                   max_bytes=DEFAULT_MAX_STORE_BYTES):
+    """
+    Pick ids to delete from (id, url, timestamp, content_hash) entries.
+    Order matters: expired first, then older copies of the same content (across URLs),
+    then the oldest survivors until both the count and the estimated byte cap hold.
+    Returns {"expired": [...], "duplicates": [...], "over_cap": [...]}.
+    """
+    expired, duplicates, keep = [], [], {}
+    for pid, url, ts, chash in sorted(entries, key=lambda e: e[2], reverse=True):   # newest first
+        if ttl and ts < now - ttl:
+            expired.append(pid)
+        elif chash in keep:
+            duplicates.append(pid)
+        else:
+            keep[chash] = (ts, pid)
+
+    cap = max_count or len(keep)
+    if max_bytes and bytes_per_entry:
+        cap = min(cap, int(max_bytes // bytes_per_entry))
+    survivors = sorted(keep.values(), reverse=True)
+    over_cap = [pid for _, pid in survivors[cap:]]
+    return {"expired": expired, "duplicates": duplicates, "over_cap": over_cap}
+
+
+def run_maintenance(store, ttl=DEFAULT_PASSAGE_TTL, max_count=DEFAULT_MAX_PASSAGES,
+                    max_bytes=DEFAULT_MAX_STORE_BYTES, compact=True, dry_run=False) -> dict:
+    """
+    Evict, dedupe, cap and compact one VectorStore; returns a before/after report.
+    The byte cap applies to live data (store.live_bytes()), not to the files on disk:
+    preallocation and space a backend cannot reclaim would otherwise keep the store
+    "over cap" and evict more passages on every run.
+    """
+    start = time.time()
+    before = {"passages": store.count(), "bytes": store.size_bytes(), "live_bytes": store.live_bytes()}
+    entries = store.entries()
+    bytes_per_entry = before["live_bytes"] / len(entries) if entries else 0.0
+    plan = plan_evictions(entries, start, ttl, max_count, bytes_per_entry, max_bytes)
+    doomed = plan["expired"] + plan["duplicates"] + plan["over_cap"]
+
+    compacted = False
+    if not dry_run:
+        if doomed:
+            store.delete(doomed)
+        if compact:
+            compacted = store.compact()
+
+    after = before if dry_run else {"passages": store.count(), "bytes": store.size_bytes(),
+                                    "live_bytes": store.live_bytes()}
+    report = {
+        "backend": store.name,
+        "dry_run": dry_run,
+        "before": before,
+        "after": after,
+        "expired": len(plan["expired"]),
+        "duplicates": len(plan["duplicates"]),
+        "over_cap": len(plan["over_cap"]),
+        "compacted": compacted,
+        # on-disk size can stay above max_bytes where compaction cannot give space back (Chroma's HNSW files)
+        "bytes_cap_met": None if not max_bytes else after["live_bytes"] <= max_bytes,
+        "seconds": round(time.time() - start, 3),
+    }
+    print(f"Vector store maintenance: {report['before']['passages']} -> {report['after']['passages']} passages, "
+          f"{report['before']['bytes']} -> {report['after']['bytes']} bytes")
+    return report
+
+
+async def maintenance_loop(get_store, interval=DEFAULT_MAINTENANCE_INTERVAL, **kwargs):
+    """Background task for the app lifespan: run_maintenance off the event loop every `interval` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        store = get_store()
+        if store is None:
+            continue
+        try:
+            await asyncio.to_thread(run_maintenance, store, **kwargs)
+        except Exception as e:
+            print(f"Vector store maintenance failed: {type(e).__name__}: {e}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evict, dedupe, cap and compact the research passage store.")
+    parser.add_argument("--backend", choices=VECTOR_STORES, default=DEFAULT_VECTOR_STORE)
+    parser.add_argument("--path", default=None, help="store directory (backend default if omitted)")
+    parser.add_argument("--ttl-days", type=float, default=DEFAULT_PASSAGE_TTL / 86400, help="0 keeps everything")
+    parser.add_argument("--max-count", type=int, default=DEFAULT_MAX_PASSAGES, help="0 for no count cap")
+    parser.add_argument("--max-mb", type=float, default=DEFAULT_MAX_STORE_BYTES / 1024**2, help="cap on live passage data; 0 for no size cap")
+    parser.add_argument("--no-compact", action="store_true")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be removed")
+    args = parser.parse_args(argv)
+
+    store = open_vector_store(args.backend, args.path)
+    try:
+        report = run_maintenance(store, ttl=args.ttl_days * 86400, max_count=args.max_count,
+                                 max_bytes=int(args.max_mb * 1024**2), compact=not args.no_compact,
+                                 dry_run=args.dry_run)
+    finally:
+        store.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
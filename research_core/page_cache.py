@@ -0,0 +1,142 @@
+# research_core/page_cache.py
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+import urllib.parse
+
+try:
+    import zstandard
+    _ZC = zstandard.ZstdCompressor(level=6)
+    _ZD = zstandard.ZstdDecompressor()
+    CODEC = "zstd"
+except ImportError:
+    import zlib
+    CODEC = "zlib"
+
+DEFAULT_CACHE_DIR = os.getenv("RESEARCH_CACHE_DIR", "./research_cache")
+DEFAULT_PAGE_TTL = 6 * 3600               # seconds before a cached page must be revalidated
+DEFAULT_PAGE_CACHE_BYTES = 200 * 1024**2  # compressed bytes kept before LRU eviction
+
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid", "ref_src")
+
+
+def canonical_url(url: str) -> str:
+    """Lower-case scheme/host, drop fragments, default ports and tracking params, sort the query."""
+    p = urllib.parse.urlsplit(url.strip())
+    scheme = p.scheme.lower()
+    host = (p.hostname or "").lower()
+    if p.port and not ((scheme == "http" and p.port == 80) or (scheme == "https" and p.port == 443)):
+        host = f"{host}:{p.port}"
+    query = [(k, v) for k, v in urllib.parse.parse_qsl(p.query, keep_blank_values=True)
+             if not k.lower().startswith(_TRACKING_PARAMS)]
+    return urllib.parse.urlunsplit((scheme, host, p.path or "/", urllib.parse.urlencode(sorted(query)), ""))
+
+
+def _compress(text: str):
+    data = text.encode("utf-8")
+    if CODEC == "zstd":
+        return _ZC.compress(data), "zstd"
+    return zlib.compress(data, 6), "zlib"
+
+
+def _decompress(blob: bytes, codec: str) -> str:
+    if codec == "zstd":
+        return _ZD.decompress(blob).decode("utf-8")
+    import zlib
+    return zlib.decompress(blob).decode("utf-8")
+
+
+class PageCache:
+    """
+    SQLite-backed cache of extracted page text keyed by canonical URL.
+    Entries older than ttl are returned as stale together with their
+    ETag / Last-Modified so the caller can revalidate with a conditional GET.
+    """
+
+    def __init__(self, path: str = None, ttl: float = DEFAULT_PAGE_TTL, max_bytes: int = DEFAULT_PAGE_CACHE_BYTES):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "pages.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY, body BLOB, codec TEXT, etag TEXT, last_modified TEXT,
+            fetched_at REAL, accessed_at REAL, size INTEGER)""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_accessed ON pages(accessed_at)")
+        self._conn.commit()
+        self.hits = self.misses = self.revalidated = 0
+
+    def get(self, url: str):
+        """Returns {"text", "etag", "last_modified", "fresh"} or None."""
+        key = canonical_url(url)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, codec, etag, last_modified, fetched_at FROM pages WHERE url = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), key))
+            self._conn.commit()
+        body, codec, etag, last_modified, fetched_at = row
+        fresh = (time.time() - fetched_at) < self.ttl
+        if fresh:
+            self.hits += 1
+        return {"text": _decompress(body, codec), "etag": etag, "last_modified": last_modified, "fresh": fresh}
+
+    def put(self, url: str, text: str, etag: str = None, last_modified: str = None):
+        blob, codec = _compress(text)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (canonical_url(url), blob, codec, etag, last_modified, now, now, len(blob)))
+            self._conn.commit()
+            self._evict_locked()
+
+    def mark_revalidated(self, url: str):
+        """304 Not Modified: the cached copy is fresh again."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url = ?",
+                               (now, now, canonical_url(url)))
+            self._conn.commit()
+        self.revalidated += 1
+
+    def _evict_locked(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # least recently used first until we are under the cap
+        excess = total - self.max_bytes
+        doomed, freed = [], 0
+        for url, size in self._conn.execute("SELECT url, size FROM pages ORDER BY accessed_at ASC"):
+            doomed.append((url,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM pages WHERE url = ?", doomed)
+        self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        return {"entries": count, "bytes": size, "hits": self.hits, "misses": self.misses,
+                "revalidated": self.revalidated, "codec": CODEC}
+
+    # async wrappers: sqlite + (de)compression stay off the event loop
+    async def aget(self, url):
+        return await asyncio.to_thread(self.get, url)
+
+    async def aput(self, url, text, etag=None, last_modified=None):
+        return await asyncio.to_thread(self.put, url, text, etag, last_modified)
+
+    async def amark_revalidated(self, url):
+        return await asyncio.to_thread(self.mark_revalidated, url)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
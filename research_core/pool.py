@@ -0,0 +1,165 @@
+# research_core/pool.py
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
+
+DEFAULT_POOL_SIZE = int(os.getenv("RESEARCH_POOL_SIZE", "2"))
+
+_shared_pool = None
+
+
+class ResearchAgentPool:
+    """
+    Warm pool of ShortResearchAgent instances shared by the API and the graph.
+    The first agent loads the SentenceTransformer and opens the vector store,
+    the rest reuse them, so the pool size bounds concurrent research runs
+    without multiplying model memory.
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE, agent_factory=None):
+        self.size = max(1, int(size))
+        self._agent_factory = agent_factory
+        self._idle: asyncio.Queue = None
+        self._agents = []
+        self._start_lock = asyncio.Lock()
+        self._ready = asyncio.Event()
+        self._warming = False
+        self.error = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    @property
+    def state(self) -> str:
+        """"ready", "warming", "error" (last start() failed) or "cold" (not started yet)."""
+        if self.ready:
+            return "ready"
+        if self._warming:
+            return "warming"
+        return "error" if self.error else "cold"
+
+    def status(self) -> dict:
+        """Readiness snapshot for /health."""
+        return {
+            "state": self.state,
+            "ready": self.ready,
+            "size": self.size,
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "error": self.error,
+        }
+
+    @property
+    def vector_store(self):
+        """The passage store every pooled agent shares (None before start())."""
+        return getattr(self._agents[0], "vector_store", None) if self._agents else None
+
+    def _build_agents(self):
+        # Heavy constructors run in a worker thread (see start())
+        factory = self._agent_factory
+        if factory is None:
+            from agent5_async import ShortResearchAgent
+            factory = ShortResearchAgent
+        first = factory()
+        agents = [first]
+        for _ in range(self.size - 1):
+            agents.append(factory(**first.shared_resources()))
+        return agents
+
+    async def start(self):
+        """Load the agents once; safe to call from many coroutines."""
+        async with self._start_lock:
+            if self.ready:
+                return self
+            print(f"Warming research agent pool (size={self.size})...")
+            self._warming = True
+            try:
+                self._agents = await asyncio.to_thread(self._build_agents)
+                if self._agent_factory is None:
+                    from research_core.extract import get_extractor
+                    await get_extractor().warm()   # spawn HTML workers before the first request
+                    # ...and load the model in the embedding worker processes, if enabled
+                    await asyncio.to_thread(self._agents[0].embed_service.warm)
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}"
+                print(f"Research agent pool failed to start: {self.error}")
+                raise
+            finally:
+                self._warming = False
+            self._idle = asyncio.Queue()
+            for agent in self._agents:
+                self._idle.put_nowait(agent)
+            self.error = None
+            self._ready.set()
+            print("Research agent pool ready.")
+        return self
+
+    def start_background(self) -> asyncio.Task:
+        """
+        Warm the pool in a background task so the server can boot (and report
+        "warming" / "error" through /health) while the model and store load.
+        A failed start is kept in self.error instead of surfacing as an
+        unretrieved task exception.
+        """
+        async def _start():
+            try:
+                await self.start()
+            except Exception:
+                pass
+        return asyncio.create_task(_start())
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Borrow an idle agent, waiting if all of them are busy."""
+        if not self.ready:
+            await self.start()
+        agent = await self._idle.get()
+        try:
+            yield agent
+        finally:
+            self._idle.put_nowait(agent)
+
+    async def run(self, query: str, **kwargs) -> dict:
+        """Same signature as ShortResearchAgent.run, executed on a pooled agent."""
+        deadline = kwargs.get("deadline")
+        waited_from = time.monotonic()
+        async with self.acquire() as agent:
+            if deadline:
+                # time spent queueing for an idle agent counts against the caller's budget
+                kwargs["deadline"] = max(0.001, deadline - (time.monotonic() - waited_from))
+            return await agent.run(query, **kwargs)
+
+    async def run_many(self, queries, **kwargs) -> dict:
+        """ShortResearchAgent.run_many on one pooled agent: the batch shares its fetches and encodes."""
+        async with self.acquire() as agent:
+            return await agent.run_many(queries, **kwargs)
+
+    async def close(self):
+        from research_core.extract import get_extractor
+        from research_core.http import get_http_client
+        get_extractor().close()
+        await get_http_client().close()
+        for agent in self._agents:
+            if hasattr(agent, "aclose"):
+                await agent.aclose()
+        if self._agents and hasattr(self._agents[0], "embed_service"):
+            self._agents[0].embed_service.close()
+        if self._agents and hasattr(self._agents[0], "vector_store"):
+            self._agents[0].vector_store.close()
+        self._ready.clear()
+        self._agents = []
+        self._idle = None
+
+
+def get_research_pool(size: int = DEFAULT_POOL_SIZE) -> ResearchAgentPool:
+    """Return the process-wide pool, creating a lazy one if the app has not."""
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = ResearchAgentPool(size=size)
+    return _shared_pool
+
+
+def set_research_pool(pool: ResearchAgentPool):
+    global _shared_pool
+    _shared_pool = pool
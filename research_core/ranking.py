@@ -0,0 +1,81 @@
+# research_core/ranking.py
+import numpy as np
+
+
+def normalize_rows(matrix):
+    """L2-normalise each row (or a single vector) so a dot product is a cosine."""
+    m = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    return m / np.maximum(norms, 1e-10)
+
+
+def cosine_scores(candidates, query):
+    """Cosine similarity of every candidate row against the query in one matmul."""
+    cands = normalize_rows(candidates)
+    if cands.ndim == 1:
+        cands = cands.reshape(1, -1)
+    q = normalize_rows(np.asarray(query).reshape(-1))
+    return cands @ q
+
+
+def top_k(scores, k):
+    """Indices of the k best scores, best first, via partial selection."""
+    scores = np.asarray(scores)
+    n = scores.shape[0]
+    k = min(int(k), n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        part = np.argpartition(-scores, k - 1)[:k]
+    else:
+        part = np.arange(n)
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def mmr(candidates, query, k, diversity=0.3, scores=None):
+    """
+    Maximal Marginal Relevance selection.
+    diversity=0 is plain relevance ranking, higher values penalise candidates
+    that are similar to ones already picked.
+    """
+    cands = normalize_rows(candidates)
+    if scores is None:
+        scores = cands @ normalize_rows(np.asarray(query).reshape(-1))
+    n = cands.shape[0]
+    k = min(int(k), n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    selected = [int(np.argmax(scores))]
+    # running max similarity of each candidate to the selected set
+    max_sim = cands @ cands[selected[0]]
+    mask = np.zeros(n, dtype=bool)
+    mask[selected[0]] = True
+    lam = 1.0 - diversity
+    while len(selected) < k:
+        mmr_scores = lam * scores - diversity * max_sim
+        mmr_scores[mask] = -np.inf
+        nxt = int(np.argmax(mmr_scores))
+        selected.append(nxt)
+        mask[nxt] = True
+        np.maximum(max_sim, cands @ cands[nxt], out=max_sim)
+    return np.asarray(selected, dtype=np.int64)
+
+
+def rank(candidates, query, k, diversity=None):
+    """
+    Score all candidates against the query and pick the top k.
+    Returns (indices, scores) where scores covers every candidate.
+    Used for both the passage stage and the summary-sentence stage.
+    """
+    cands = np.asarray(candidates)
+    if cands.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    if cands.ndim == 1:
+        cands = cands.reshape(1, -1)
+    scores = cosine_scores(cands, query)
+    if diversity:
+        idx = mmr(cands, query, k, diversity=diversity, scores=scores)
+    else:
+        idx = top_k(scores, k)
+    return idx, scores
@@ -0,0 +1,186 @@
+# research_core/result_cache.py
+import os
+import re
+import math
+import copy
+import json
+import time
+import sqlite3
+import hashlib
+import asyncio
+import threading
+from collections import OrderedDict
+from research_core.page_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_RESULT_TTL = int(os.getenv("RESEARCH_RESULT_TTL", str(3600)))   # seconds
+DEFAULT_RESULT_MEMORY_ITEMS = 256
+
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation do not change what we research."""
+    q = re.sub(r"\s+", " ", query.strip().lower())
+    return q.rstrip("?!. ")
+
+
+def result_key(query: str, params: dict) -> str:
+    """Normalized query + the params_used tuple."""
+    payload = json.dumps([normalize_query(query), sorted(params.items())], default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class _Flight:
+    """One in-flight computation: its task, its deadline (loop time) and the progress callbacks joined on it."""
+    __slots__ = ("task", "deadline_at", "listeners", "last")
+
+    def __init__(self, deadline_at):
+        self.task = None
+        self.deadline_at = deadline_at
+        self.listeners = []
+        self.last = None
+
+    def emit(self, stage, fraction, detail=""):
+        """Progress fan-out: every caller waiting on this run sees its stages."""
+        self.last = (stage, fraction, detail)
+        for callback in list(self.listeners):
+            _notify(callback, self.last)
+
+
+def _notify(callback, event):
+    try:
+        callback(*event)
+    except Exception as e:
+        print(f"Progress callback failed: {type(e).__name__}: {e}")
+
+
+class ResultCache:
+    """
+    Research result cache: an in-memory LRU in front of a SQLite store, with a TTL.
+    get_or_compute() also coalesces concurrent identical requests (single-flight):
+    the first caller runs the pipeline, the others await the same task. A caller
+    only joins a run whose deadline is at least as generous as its own, so nobody
+    inherits a result cut short by someone else's time budget, waits on it no longer
+    than its own deadline, and receives the run's progress events.
+    """
+
+    def __init__(self, path: str = None, ttl: float = DEFAULT_RESULT_TTL, memory_items: int = DEFAULT_RESULT_MEMORY_ITEMS):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "results.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.ttl = ttl
+        self.memory_items = memory_items
+        self._memory = OrderedDict()   # key -> (stored_at, result)
+        self._inflight = {}            # key -> _Flight
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, stored_at REAL, body TEXT)")
+        self._conn.commit()
+        self.hits = self.misses = self.coalesced = 0
+
+    def _remember(self, key, stored_at, result):
+        self._memory[key] = (stored_at, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                row = self._conn.execute("SELECT stored_at, body FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = (row[0], json.loads(row[1]))
+                    self._remember(key, *entry)
+            else:
+                self._memory.move_to_end(key)
+            if entry is None or now - entry[0] > self.ttl:
+                return None
+        return copy.deepcopy(entry[1])
+
+    def put(self, key: str, result: dict):
+        now = time.time()
+        body = json.dumps(result, default=float)
+        with self._lock:
+            self._remember(key, now, json.loads(body))
+            self._conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", (key, now, body))
+            self._conn.execute("DELETE FROM results WHERE stored_at < ?", (now - self.ttl,))
+            self._conn.commit()
+
+    async def get_or_compute(self, key: str, compute, deadline: float = None, progress=None, fallback=None):
+        """
+        compute: callable(progress) returning an awaitable research result, where progress
+        is the run's fan-out callback(stage, fraction, detail).
+        deadline: the caller's time budget in seconds (None = unlimited).
+        progress: the caller's own progress callback.
+        fallback: fields of the partial result returned when a joined run outlives the
+        caller's deadline (its cut_short is ["inflight"]).
+        """
+        cached = await asyncio.to_thread(self.get, key)
+        if cached is not None:
+            self.hits += 1
+            cached["cached"] = True
+            return cached
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline_at = started + deadline if deadline else math.inf
+        flight = self._inflight.get(key)
+        if flight is not None and flight.deadline_at >= deadline_at:
+            self.coalesced += 1
+            print("Joining in-flight research run for an identical query")
+            try:
+                result = await self._wait(flight, progress, deadline_at)
+            except asyncio.TimeoutError:
+                # the shared run keeps going for its other callers and still lands in the cache
+                print("Deadline reached waiting on an in-flight run, returning a partial result")
+                return {**(fallback or {}), "passages": [], "time": loop.time() - started,
+                        "cut_short": ["inflight"], "partial": True}
+            if not (result.get("cut_short") and deadline is None):
+                return copy.deepcopy(result)
+            # partial result but this caller has no deadline: run it in full
+        self.misses += 1
+        return copy.deepcopy(await self._wait(self._start(key, compute, deadline_at), progress))
+
+    def _start(self, key, compute, deadline_at):
+        flight = _Flight(deadline_at)
+        flight.task = asyncio.ensure_future(self._compute_and_store(key, compute, flight.emit))
+        # later identical callers join the most generous run
+        current = self._inflight.get(key)
+        if current is None or current.deadline_at <= deadline_at:
+            self._inflight[key] = flight
+
+        def _done(_t):
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+        flight.task.add_done_callback(_done)
+        return flight
+
+    @staticmethod
+    async def _wait(flight, progress, deadline_at=math.inf):
+        """Await the flight's result, for at most until deadline_at (loop time)."""
+        if progress is not None:
+            flight.listeners.append(progress)
+            if flight.last is not None:
+                _notify(progress, flight.last)   # catch up with the stage the run is in
+        try:
+            # shield: one cancelled or timed-out caller must not cancel the run the others are waiting on
+            waiter = asyncio.shield(flight.task)
+            if deadline_at == math.inf:
+                return await waiter
+            return await asyncio.wait_for(waiter, max(0.0, deadline_at - asyncio.get_running_loop().time()))
+        finally:
+            if progress is not None:
+                flight.listeners.remove(progress)
+
+    async def _compute_and_store(self, key, compute, progress):
+        result = await compute(progress)
+        if result.get("passages") and not result.get("cut_short"):   # never cache empty, failed or partial runs
+            await asyncio.to_thread(self.put, key, result)
+        return result
+
+    def stats(self) -> dict:
+        return {"memory_items": len(self._memory), "hits": self.hits, "misses": self.misses,
+                "coalesced": self.coalesced, "inflight": len(self._inflight)}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,104 @@
+# research_core/search.py
+import os
+import json
+import asyncio
+import urllib.parse
+from abc import ABC, abstractmethod
+
+DEFAULT_PROVIDER_TIMEOUT = 8
+
+
+def unwrap_ddg(url):
+    """If DuckDuckGo returns a redirect wrapper, extract the real URL."""
+    try:
+        parsed = urllib.parse.urlparse(url)
+        if "duckduckgo.com" in parsed.netloc:
+            qs = urllib.parse.parse_qs(parsed.query)
+            uddg = qs.get("uddg")
+            if uddg:
+                return urllib.parse.unquote(uddg[0])
+    except Exception:
+        pass
+    return url
+
+
+class SearchProvider(ABC):
+    """Async search provider interface: search() returns a list of result URLs."""
+    name = "base"
+
+    def __init__(self, timeout: float = DEFAULT_PROVIDER_TIMEOUT):
+        self.timeout = timeout
+
+    @abstractmethod
+    async def search(self, query: str, max_results: int) -> list:
+        ...
+
+
+class DDGSProvider(SearchProvider):
+    """DuckDuckGo via ddgs. The client is synchronous, so it runs in a worker thread."""
+    name = "ddgs"
+
+    @staticmethod
+    def _search_sync(query, max_results):
+        from ddgs import DDGS
+        urls = []
+        with DDGS() as ddgs:
+            for r in ddgs.text(query, max_results=max_results):
+                url = r.get("href") or r.get("url")
+                if url:
+                    urls.append(unwrap_ddg(url))
+        return urls
+
+    async def search(self, query: str, max_results: int) -> list:
+        return await asyncio.to_thread(self._search_sync, query, max_results)
+
+
+class FixtureSearchProvider(SearchProvider):
+    """
+    Offline provider backed by a JSON file for tests and demos:
+    {"<query>": ["https://...", ...], "*": [...fallback urls...]}
+    """
+    name = "fixture"
+
+    def __init__(self, path: str, timeout: float = DEFAULT_PROVIDER_TIMEOUT):
+        super().__init__(timeout)
+        self.path = path
+        with open(path) as f:
+            self.results = json.load(f)
+
+    async def search(self, query: str, max_results: int) -> list:
+        urls = self.results.get(query) or self.results.get(query.strip().lower()) or self.results.get("*", [])
+        return list(urls)[:max_results]
+
+
+def default_providers() -> list:
+    """DDGS by default; RESEARCH_SEARCH_FIXTURE=<file.json> switches to the offline fixture."""
+    fixture = os.getenv("RESEARCH_SEARCH_FIXTURE")
+    if fixture:
+        return [FixtureSearchProvider(fixture)]
+    return [DDGSProvider()]
+
+
+async def search_all(providers, query: str, max_results: int) -> list:
+    """
+    Run every provider concurrently, each bounded by its own timeout.
+    Failed or slow providers contribute nothing; URLs are merged in provider order, deduplicated.
+    """
+    async def _one(p):
+        try:
+            return await asyncio.wait_for(p.search(query, max_results), timeout=p.timeout)
+        except asyncio.TimeoutError:
+            print(f"Search provider {p.name} timed out after {p.timeout}s")
+        except Exception as e:
+            print(f"Search provider {p.name} failed: {type(e).__name__}: {e}")
+        return []
+
+    results = await asyncio.gather(*[_one(p) for p in providers])
+    seen = set()
+    urls = []
+    for batch in results:
+        for u in batch:
+            if u not in seen:
+                seen.add(u)
+                urls.append(u)
+    return urls[:max_results]
@@ -0,0 +1,59 @@
+# research_core/sync_agent.py
+import queue
+import asyncio
+import threading
+from research_core.pool import ResearchAgentPool
+
+
+class SyncResearchAgent:
+    """
+    Blocking facade over the async research engine for sync callers (Streamlit).
+    A dedicated daemon thread owns an event loop and a warm ResearchAgentPool,
+    so the pooled HTTP session, embedding service and HTML workers live across
+    calls instead of being rebuilt by asyncio.run() each time.
+    Progress events are handed back to the calling thread, so UI callbacks run
+    where the UI framework expects them.
+    """
+
+    def __init__(self, pool: ResearchAgentPool = None, pool_size: int = 1):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="research-loop", daemon=True)
+        self._thread.start()
+        self.pool = pool or ResearchAgentPool(size=pool_size)
+        self._submit(self.pool.start()).result()
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, query: str, progress=None, poll_interval: float = 0.05, **params) -> dict:
+        """
+        Same keyword parameters as ShortResearchAgent.run.
+        progress: optional callback(stage, fraction, detail), called in this thread.
+        """
+        if progress is None:
+            return self._submit(self.pool.run(query, **params)).result()
+        events = queue.Queue()
+        emit = lambda stage, fraction, detail="": events.put((stage, fraction, detail))
+        future = self._submit(self.pool.run(query, progress=emit, **params))
+        while True:
+            try:
+                event = events.get(timeout=poll_interval)
+            except queue.Empty:
+                if future.done():
+                    break
+                continue
+            progress(*event)
+        while not events.empty():
+            progress(*events.get_nowait())
+        result = future.result()
+        if result.get("cached"):
+            progress("done", 1.0, "cached result")
+        return result
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        self._submit(self.pool.close()).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
@@ -0,0 +1,461 @@
+# research_core/vector_store.py
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+import numpy as np
+from research_core.ranking import normalize_rows, top_k
+
+try:
+    import fcntl
+except ImportError:   # Windows: no cross-process locking, keep one process per mmap store
+    fcntl = None
+
+VECTOR_STORES = ("chroma", "mmap")
+DEFAULT_VECTOR_STORE = os.getenv("RESEARCH_VECTOR_STORE", "chroma")
+DEFAULT_CHROMA_DIR = "./chroma_research_db"
+DEFAULT_VECTOR_DIR = os.getenv("RESEARCH_VECTOR_DIR", "./research_vectors")
+DEFAULT_COLLECTION = "research_passages"
+DEFAULT_INITIAL_ROWS = 4096
+DEFAULT_SCAN_BLOCK = 65536   # float16 rows upcast per block during a scan
+
+
+class VectorStore(ABC):
+    """
+    Where research passages are persisted for local-knowledge lookups.
+    Every backend stores (id, embedding, document, {url, query, timestamp}) and
+    answers nearest-neighbour queries restricted to passages newer than a timestamp.
+    """
+    name = "base"
+
+    @abstractmethod
+    def existing_ids(self, ids) -> set:
+        ...
+
+    @abstractmethod
+    def add(self, ids, embeddings, documents, metadatas) -> int:
+        """Add passages whose id is not stored yet; returns how many were added."""
+        ...
+
+    @abstractmethod
+    def query(self, q_emb, n_results, min_timestamp=None):
+        """Up to n_results nearest passages: (documents, metadatas, float32 embeddings)."""
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    # maintenance (research_core/maintenance.py)
+    @abstractmethod
+    def entries(self):
+        """(id, url, timestamp, content_hash) for every stored passage."""
+        ...
+
+    @abstractmethod
+    def delete(self, ids) -> int:
+        ...
+
+    def compact(self) -> bool:
+        """Reclaim space left by deletes; False if the backend cannot."""
+        return False
+
+    @abstractmethod
+    def size_bytes(self) -> int:
+        """Bytes on disk, including preallocated and not yet reclaimed space."""
+        ...
+
+    @abstractmethod
+    def live_bytes(self) -> int:
+        """Estimated bytes of the stored passages themselves (vectors, timestamps, text)."""
+        ...
+
+    def close(self):
+        pass
+
+
+def content_hash(document: str) -> str:
+    """Whitespace/case-insensitive hash, so syndicated copies of a passage collide."""
+    norm = " ".join(document.lower().split())
+    return hashlib.blake2b(norm.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def _dir_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return total
+
+
+class ChromaVectorStore(VectorStore):
+    """The original ChromaDB collection, behind the VectorStore interface."""
+    name = "chroma"
+
+    def __init__(self, persist_dir: str = DEFAULT_CHROMA_DIR, client=None, collection: str = DEFAULT_COLLECTION):
+        import chromadb   # imported on demand so the mmap backend never pays for it
+        self.persist_dir = persist_dir
+        self.client = client or chromadb.PersistentClient(path=persist_dir)
+        self.collection = self.client.get_or_create_collection(collection)
+
+    def existing_ids(self, ids) -> set:
+        return set(self.collection.get(ids=list(ids), include=[])["ids"])
+
+    def add(self, ids, embeddings, documents, metadatas) -> int:
+        seen = self.existing_ids(ids)
+        new = []
+        for i, pid in enumerate(ids):
+            if pid not in seen:
+                seen.add(pid)
+                new.append(i)
+        if not new:
+            return 0
+        self.collection.add(
+            ids=[ids[i] for i in new],
+            embeddings=[np.asarray(embeddings[i], dtype=np.float32).tolist() for i in new],
+            documents=[documents[i] for i in new],
+            metadatas=[metadatas[i] for i in new],
+        )
+        return len(new)
+
+    def query(self, q_emb, n_results, min_timestamp=None):
+        total = self.collection.count()
+        if total == 0:
+            return [], [], np.empty((0, 0), dtype=np.float32)
+        res = self.collection.query(
+            query_embeddings=[np.asarray(q_emb, dtype=np.float32).tolist()],
+            n_results=min(n_results, total),
+            where={"timestamp": {"$gte": min_timestamp}} if min_timestamp is not None else None,
+            include=["documents", "metadatas", "embeddings"],
+        )
+        if not res["ids"] or not res["ids"][0]:
+            return [], [], np.empty((0, 0), dtype=np.float32)
+        return res["documents"][0], res["metadatas"][0], np.asarray(res["embeddings"][0], dtype=np.float32)
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def entries(self, page_size: int = 5000):
+        out, offset = [], 0
+        while True:
+            res = self.collection.get(include=["metadatas", "documents"], limit=page_size, offset=offset)
+            for pid, meta, doc in zip(res["ids"], res["metadatas"], res["documents"]):
+                meta = meta or {}
+                out.append((pid, meta.get("url", ""), float(meta.get("timestamp", 0.0)), content_hash(doc or "")))
+            if len(res["ids"]) < page_size:
+                return out
+            offset += page_size
+
+    def delete(self, ids, batch: int = 5000) -> int:
+        ids = list(ids)
+        for i in range(0, len(ids), batch):
+            self.collection.delete(ids=ids[i:i + batch])
+        return len(ids)
+
+    def size_bytes(self) -> int:
+        return _dir_bytes(self.persist_dir)
+
+    def live_bytes(self, page_size: int = 5000) -> int:
+        """float32 vectors + a float64 timestamp + document text per passage."""
+        count = self.collection.count()
+        if count == 0:
+            return 0
+        dim = len(self.collection.get(limit=1, include=["embeddings"])["embeddings"][0])
+        text, offset = 0, 0
+        while offset < count:
+            res = self.collection.get(include=["documents"], limit=page_size, offset=offset)
+            text += sum(len((doc or "").encode("utf-8")) for doc in res["documents"])
+            if len(res["ids"]) < page_size:
+                break
+            offset += page_size
+        return count * (4 * dim + 8) + text
+
+    def compact(self) -> bool:
+        """
+        VACUUM Chroma's SQLite file (documents, metadata, embedding queue) so deleted
+        rows give their pages back. Chroma's HNSW segment files are not rewritten:
+        their deleted labels are reused by later adds rather than freed, so the
+        directory does not shrink all the way to live_bytes().
+        """
+        db = os.path.join(self.persist_dir, "chroma.sqlite3")
+        if not os.path.exists(db):
+            return False
+        try:
+            conn = sqlite3.connect(db, timeout=30)
+            try:
+                conn.execute("VACUUM")
+            finally:
+                conn.close()
+        except sqlite3.OperationalError as e:
+            print(f"Chroma VACUUM skipped: {e}")
+            return False
+        return True
+
+
+class MmapVectorStore(VectorStore):
+    """
+    Flat index on a memory-mapped float16 matrix of L2-normalized vectors plus a
+    float64 timestamp column, with documents and metadata in a SQLite sidecar.
+    Opening maps the files without reading them, a query is one blocked
+    matmul + argpartition over the live rows, and each passage costs 2 bytes per
+    dimension instead of Chroma's float32 vectors and HNSW graph.
+    Several processes may open one store (the app, the maintenance CLI): writes
+    hold an exclusive flock on <path>/.lock and reads a shared one, and each
+    operation reloads the row count and file generation from the sidecar first,
+    so a compaction or growth made by another process is picked up by remapping.
+    """
+    name = "mmap"
+
+    def __init__(self, path: str = DEFAULT_VECTOR_DIR, initial_rows: int = DEFAULT_INITIAL_ROWS):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.initial_rows = initial_rows
+        self._lock = threading.Lock()
+        self._lock_file = open(os.path.join(path, ".lock"), "a+")
+        self._conn = sqlite3.connect(os.path.join(path, "passages.sqlite"), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS passages (
+            row INTEGER PRIMARY KEY, id TEXT UNIQUE, url TEXT, query TEXT, timestamp REAL, document TEXT)""")
+        self._conn.commit()
+        self.dim = None
+        self.capacity = 0
+        self.generation = 0
+        self._used = 0   # rows written, including deleted ones until compact()
+        self._vectors = self._times = None
+        self._mapped = None   # (generation, capacity) of the current mapping
+        with self._locked():
+            pass
+
+    @contextmanager
+    def _locked(self, exclusive=False):
+        """Thread lock + cross-process flock, then resync with whatever other processes wrote."""
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                self._refresh()
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _files(self, generation):
+        """Backing files of one generation; compaction writes the next one instead of overwriting."""
+        suffix = "" if generation == 0 else f".{generation}"
+        return (os.path.join(self.path, f"vectors{suffix}.f16"), os.path.join(self.path, f"timestamps{suffix}.f64"))
+
+    def _refresh(self):
+        meta = dict(self._conn.execute("SELECT k, v FROM meta").fetchall())
+        self.dim = int(meta["dim"]) if "dim" in meta else None
+        self.capacity = int(meta.get("capacity", 0))
+        self.generation = int(meta.get("generation", 0))
+        self._used = int(meta.get("used", 0))
+        if self._mapped != (self.generation, self.capacity):
+            self._vectors = self._times = None
+            self._mapped = None
+            if self.dim and self.capacity and os.path.exists(self._files(self.generation)[0]):
+                self._map()
+
+    def _map(self):
+        vectors_path, times_path = self._files(self.generation)
+        self._vectors = np.memmap(vectors_path, dtype=np.float16, mode="r+", shape=(self.capacity, self.dim))
+        self._times = np.memmap(times_path, dtype=np.float64, mode="r+", shape=(self.capacity,))
+        self._mapped = (self.generation, self.capacity)
+
+    def _grow(self, needed: int, dim: int):
+        """Double the backing files until `needed` rows fit (files are extended, never copied)."""
+        if self.dim is None:
+            self.dim = dim
+        elif dim != self.dim:
+            raise ValueError(f"embedding dim {dim} != store dim {self.dim}")
+        if needed <= self.capacity and self._vectors is not None:
+            return
+        capacity = max(self.capacity, self.initial_rows)
+        while capacity < needed:
+            capacity *= 2
+        self._flush_locked()
+        for file_path, row_bytes in zip(self._files(self.generation), (2 * self.dim, 8)):
+            with open(file_path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        self.capacity = capacity
+        self._map()
+        self._write_meta()
+
+    def _write_meta(self):
+        self._conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                               [("dim", str(self.dim)), ("capacity", str(self.capacity)), ("used", str(self._used)),
+                                ("generation", str(self.generation))])
+
+    def _flush_locked(self):
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._times.flush()
+
+    def existing_ids(self, ids) -> set:
+        ids = list(ids)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id FROM passages WHERE id IN ({','.join('?' * len(ids))})", ids).fetchall()
+        return {r[0] for r in rows}
+
+    def add(self, ids, embeddings, documents, metadatas) -> int:
+        embeddings = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        with self._locked(exclusive=True):
+            found = self._conn.execute(
+                f"SELECT id FROM passages WHERE id IN ({','.join('?' * len(ids))})", list(ids)).fetchall()
+            seen = {r[0] for r in found}
+            new = []
+            for i, pid in enumerate(ids):
+                if pid not in seen:
+                    seen.add(pid)
+                    new.append(i)
+            if not new:
+                return 0
+            start = self._used
+            self._grow(start + len(new), embeddings.shape[1])
+            rows = []
+            for offset, i in enumerate(new):
+                row = start + offset
+                meta = metadatas[i]
+                ts = float(meta.get("timestamp", time.time()))
+                self._vectors[row] = embeddings[i]
+                self._times[row] = ts
+                rows.append((row, ids[i], meta.get("url", ""), meta.get("query", ""), ts, documents[i]))
+            # vectors hit the disk before the sidecar points at them
+            self._flush_locked()
+            self._used = start + len(new)
+            self._conn.executemany("INSERT INTO passages VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._write_meta()
+            self._conn.commit()
+        return len(new)
+
+    def query(self, q_emb, n_results, min_timestamp=None):
+        with self._locked():
+            n = self._used
+            if n == 0 or self._vectors is None:
+                return [], [], np.empty((0, 0), dtype=np.float32)
+            q = normalize_rows(np.asarray(q_emb, dtype=np.float32)[None, :])[0]
+            scores = np.empty(n, dtype=np.float32)
+            for b in range(0, n, DEFAULT_SCAN_BLOCK):
+                block = np.asarray(self._vectors[b:min(b + DEFAULT_SCAN_BLOCK, n)], dtype=np.float32)
+                scores[b:b + len(block)] = block @ q
+            # deleted rows carry a NaN timestamp, which fails every comparison
+            floor = -np.inf if min_timestamp is None else min_timestamp
+            scores[~(np.asarray(self._times[:n]) >= floor)] = -np.inf
+            idx = [int(i) for i in top_k(scores, n_results) if np.isfinite(scores[i])]
+            if not idx:
+                return [], [], np.empty((0, 0), dtype=np.float32)
+            embs = np.asarray(self._vectors[idx], dtype=np.float32)
+            by_row = {r[0]: r[1:] for r in self._conn.execute(
+                f"SELECT row, url, query, timestamp, document FROM passages WHERE row IN ({','.join('?' * len(idx))})",
+                idx)}
+        documents = [by_row[i][3] for i in idx]
+        metadatas = [{"url": by_row[i][0], "query": by_row[i][1], "timestamp": by_row[i][2]} for i in idx]
+        return documents, metadatas, embs
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM passages").fetchone()[0]
+
+    def entries(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT id, url, timestamp, document FROM passages").fetchall()
+        return [(pid, url, ts, content_hash(doc)) for pid, url, ts, doc in rows]
+
+    def delete(self, ids) -> int:
+        """Tombstone rows (NaN timestamp); their space comes back on compact()."""
+        ids = list(ids)
+        removed = 0
+        with self._locked(exclusive=True):
+            for i in range(0, len(ids), 500):
+                part = ids[i:i + 500]
+                marks = ",".join("?" * len(part))
+                rows = [r[0] for r in self._conn.execute(f"SELECT row FROM passages WHERE id IN ({marks})", part)]
+                if rows:
+                    self._times[rows] = np.nan
+                    self._conn.execute(f"DELETE FROM passages WHERE id IN ({marks})", part)
+                    removed += len(rows)
+            self._flush_locked()
+            self._conn.commit()
+        return removed
+
+    def compact(self) -> bool:
+        """
+        Rewrite live rows contiguously into the next generation of files, then switch the
+        sidecar (row numbers + generation) to them in one transaction, so a crash at any
+        point leaves either the old or the new generation consistent. VACUUMs the sidecar.
+        """
+        with self._locked(exclusive=True):
+            if self._vectors is None:
+                return False
+            live = [r[0] for r in self._conn.execute("SELECT row FROM passages ORDER BY row")]
+            capacity = self.initial_rows
+            while capacity < len(live):
+                capacity *= 2
+            generation = self.generation + 1
+            for file_path, column, row_bytes in zip(self._files(generation), (self._vectors, self._times),
+                                                    (2 * self.dim, 8)):
+                data = np.array(column[live]) if live else np.empty((0,) + column.shape[1:], dtype=column.dtype)
+                with open(file_path, "wb") as f:
+                    f.write(data.tobytes())
+                    f.truncate(capacity * row_bytes)
+                    f.flush()
+                    os.fsync(f.fileno())
+            try:
+                self._switch_generation(live, generation, capacity)
+            except BaseException:
+                self._conn.rollback()
+                self._refresh()   # still on the old generation; the new files are removed next time
+                raise
+            self._vectors = self._times = None
+            self._map()
+            # the old generation (and leftovers of an interrupted compaction) are unreferenced now
+            for file_path in os.listdir(self.path):
+                full = os.path.join(self.path, file_path)
+                if file_path.startswith(("vectors", "timestamps")) and full not in self._files(generation):
+                    os.remove(full)
+            self._conn.execute("VACUUM")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return True
+
+    def _switch_generation(self, live, generation, capacity):
+        """Point the sidecar at the compacted files: row remap + meta, committed together."""
+        # ascending order: each row moves to an index <= its old one, so keys never collide
+        self._conn.executemany("UPDATE passages SET row = ? WHERE row = ?",
+                               [(new, old) for new, old in enumerate(live) if new != old])
+        self.capacity, self._used, self.generation = capacity, len(live), generation
+        self._write_meta()
+        self._conn.commit()
+
+    def size_bytes(self) -> int:
+        return _dir_bytes(self.path)
+
+    def live_bytes(self) -> int:
+        """float16 vector + float64 timestamp per live row, plus the sidecar's text."""
+        with self._locked():
+            count, text = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(document AS BLOB)) + LENGTH(CAST(url AS BLOB))), 0) "
+                "FROM passages").fetchone()
+        return count * (2 * (self.dim or 0) + 8) + text
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+            self._lock_file.close()
+
+
+def open_vector_store(backend: str = DEFAULT_VECTOR_STORE, path: str = None, **kwargs) -> VectorStore:
+    """Build a store by backend name ("chroma" or "mmap")."""
+    if backend == "chroma":
+        return ChromaVectorStore(path or DEFAULT_CHROMA_DIR, **kwargs)
+    if backend == "mmap":
+        return MmapVectorStore(path or DEFAULT_VECTOR_DIR, **kwargs)
+    raise ValueError(f"Unknown vector store {backend!r}; expected one of {VECTOR_STORES}")
@@ -0,0 +1,69 @@
+# scripts/bench_chunking.py
+"""
+Benchmark: chunk_passages + split_sentences (word list + re-joined strings) vs
+research_core.chunking (one tokenizing pass, offset views). Measures time and
+peak traced allocation for keeping passages_per_page passages of a long page
+and splitting them into sentences.
+
+    python -m scripts.bench_chunking
+"""
+import re
+import time
+import random
+import tracemalloc
+from research_core.chunking import TokenizedText
+
+PASSAGES_PER_PAGE = 4
+
+
+def chunk_passages(text, max_words=120, overlap=20):
+    words = text.split()
+    chunks, i = [], 0
+    while i < len(words):
+        chunks.append(" ".join(words[i: i + max_words]))
+        i += max_words - overlap
+    return chunks
+
+
+def split_sentences(text):
+    parts = re.split(r'(?<=[.!?])\s+', text)
+    return [p.strip() for p in parts if p.strip()]
+
+
+def old_path(text):
+    kept = chunk_passages(text)[:PASSAGES_PER_PAGE]
+    return kept, [s for p in kept for s in split_sentences(p)]
+
+
+def new_path(text):
+    kept = TokenizedText(text).passages()[:PASSAGES_PER_PAGE]
+    return [p.text for p in kept], [s for p in kept for s in p.sentences()]
+
+
+def measure(fn, text, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    fn(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    rng = random.Random(0)
+    vocab = "heat island asphalt concrete shade trees roof. cooling city! summer? night temperature".split()
+    print(f"{'page words':>10} {'old ms':>8} {'new ms':>8} {'old peak KB':>12} {'new peak KB':>12}")
+    for n_words in (2_000, 20_000, 100_000):
+        text = " ".join(rng.choice(vocab) for _ in range(n_words))
+        assert old_path(text) == new_path(text)
+        t_old, m_old = measure(old_path, text)
+        t_new, m_new = measure(new_path, text)
+        print(f"{n_words:>10} {t_old*1e3:>8.2f} {t_new*1e3:>8.2f} {m_old/1024:>12.0f} {m_new/1024:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# scripts/bench_embedders.py
+"""
+Benchmark: torch SentenceTransformer vs onnxruntime (fp32 / dynamic int8) for
+all-MiniLM-L6-v2 on CPU. Each backend runs in its own process so peak RSS is
+measured in isolation. Reports load time, throughput, peak RSS and how well
+each backend's rankings agree with torch (top-k overlap and Spearman rho).
+
+    python -m scripts.bench_embedders --texts 2000 --backends torch onnx onnx-int8
+"""
+import argparse
+import multiprocessing
+import random
+import resource
+import sys
+import time
+import numpy as np
+
+MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+TOPICS = ["urban heat islands", "cool roofs", "tree canopy", "asphalt albedo", "heat waves",
+          "green infrastructure", "air conditioning demand", "public health", "city planning", "water features"]
+QUERIES = ["What causes urban heat islands?", "How do cool roofs reduce temperatures?",
+           "Health effects of extreme urban heat", "Role of trees in cooling cities"]
+
+
+def make_corpus(n, seed=0):
+    rng = random.Random(seed)
+    words = "the a city street surface summer night temperature reduces increases shade energy cost study data".split()
+    return [f"{rng.choice(TOPICS)} " + " ".join(rng.choice(words) for _ in range(rng.randint(8, 90)))
+            for _ in range(n)]
+
+
+def _peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+def _worker(backend, texts, batch_size, out):
+    from research_core.embedders import load_embedder
+    t0 = time.perf_counter()
+    embedder = load_embedder(MODEL, backend)
+    embedder.encode(texts[:8], batch_size=batch_size)   # warm-up
+    load_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    embs = embedder.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    encode_s = time.perf_counter() - t0
+    q = embedder.encode(QUERIES, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    out.put({"backend": backend, "load_s": load_s, "encode_s": encode_s, "rss_mb": _peak_rss_mb(),
+             "embs": np.asarray(embs, dtype=np.float32), "q": np.asarray(q, dtype=np.float32)})
+
+
+def run_backend(backend, texts, batch_size):
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    proc = ctx.Process(target=_worker, args=(backend, texts, batch_size, out))
+    proc.start()
+    res = out.get()
+    proc.join()
+    return res
+
+
+def spearman(a, b):
+    ra, rb = np.argsort(np.argsort(a)), np.argsort(np.argsort(b))
+    return float(np.corrcoef(ra, rb)[0, 1])
+
+
+def agreement(ref, other, k):
+    from research_core.ranking import rank
+    overlaps, rhos = [], []
+    for qi in range(len(QUERIES)):
+        ref_idx, ref_scores = rank(ref["embs"], ref["q"][qi], k)
+        oth_idx, oth_scores = rank(other["embs"], other["q"][qi], k)
+        overlaps.append(len(set(ref_idx) & set(oth_idx)) / k)
+        rhos.append(spearman(ref_scores, oth_scores))
+    return float(np.mean(overlaps)), float(np.mean(rhos))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    args = parser.parse_args()
+
+    texts = make_corpus(args.texts)
+    results = [run_backend(b, texts, args.batch_size) for b in args.backends]
+    ref = next((r for r in results if r["backend"] == "torch"), results[0])
+
+    print(f"{args.texts} texts, batch {args.batch_size}, reference = {ref['backend']}\n")
+    print(f"{'backend':>10} {'load s':>8} {'texts/s':>9} {'peak RSS MB':>12} {f'top{args.top_k} overlap':>14} {'spearman':>9}")
+    for r in results:
+        overlap, rho = agreement(ref, r, args.top_k)
+        print(f"{r['backend']:>10} {r['load_s']:>8.2f} {args.texts / r['encode_s']:>9.0f} {r['rss_mb']:>12.0f} "
+              f"{overlap:>14.2f} {rho:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
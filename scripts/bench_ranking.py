@@ -0,0 +1,63 @@
+# scripts/bench_ranking.py
+"""
+Benchmark: per-candidate cosine_sklearn loop + argsort (old ShortResearchAgent.run)
+vs. research_core.ranking (one normalized matmul + argpartition).
+
+Candidate count = search_results x passages_per_page, embeddings are random
+384-dim vectors (all-MiniLM-L6-v2 width) so no model download is needed.
+
+    python -m scripts.bench_ranking
+"""
+import time
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+from research_core.ranking import rank
+
+DIM = 384
+TOP_K = 5
+GRID = [(5, 4), (13, 4), (20, 10), (25, 10), (25, 40), (50, 80)]
+
+
+def cosine_sklearn(a, b):
+    a = np.asarray(a).reshape(1, -1)
+    b = np.asarray(b).reshape(1, -1)
+    return cosine_similarity(a, b)[0][0]
+
+
+def loop_rank(embs, q, k):
+    sims = [cosine_sklearn(e, q) for e in embs]
+    return np.argsort(sims)[::-1][:k]
+
+
+def timeit(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'results x ppp':>14} {'candidates':>10} {'loop ms':>10} {'matmul ms':>10} {'speedup':>8} {'agree':>6}")
+    for search_results, ppp in GRID:
+        n = search_results * ppp
+        embs = rng.standard_normal((n, DIM)).astype(np.float32)
+        q = rng.standard_normal(DIM).astype(np.float32)
+
+        t_loop = timeit(lambda: loop_rank(embs, q, TOP_K))
+        t_vec = timeit(lambda: rank(embs, q, TOP_K))
+        agree = list(loop_rank(embs, q, TOP_K)) == list(rank(embs, q, TOP_K)[0])
+        print(f"{search_results:>6} x {ppp:<5} {n:>10} {t_loop*1e3:>10.2f} {t_vec*1e3:>10.3f} "
+              f"{t_loop / max(t_vec, 1e-9):>7.0f}x {str(agree):>6}")
+
+    n = 25 * 40
+    embs = rng.standard_normal((n, DIM)).astype(np.float32)
+    q = rng.standard_normal(DIM).astype(np.float32)
+    t_mmr = timeit(lambda: rank(embs, q, TOP_K, diversity=0.3))
+    print(f"\nMMR (diversity=0.3) over {n} candidates: {t_mmr*1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
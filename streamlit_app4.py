@@ -3,10 +3,9 @@ import PyPDF2
 import pandas as pd
 from processor import TextAnalysisProcessor
 from langchain_agent4 import AIAgent  # the refactored agent with structured DB output
-from scripts.agent5 import ShortResearchAgent  # web agent with async and better config
+from research_core.sync_agent import SyncResearchAgent  # concurrent agent5_async engine on a background loop
 import os
 from dotenv import load_dotenv
-import time
 
 load_dotenv()
 
@@ -28,7 +27,7 @@ def get_agent(working_dir: str):
 
 @st.cache_resource
 def get_researcher():
-    return ShortResearchAgent()
+    return SyncResearchAgent()
 
 
 processor = get_processor()
@@ -216,21 +215,30 @@ elif task == "Semantic Web Researcher":
                 progress_bar = st.progress(0, text="Starting research...")
                 status_text = st.empty()
 
-                # Step 1: Search
-                status_text.info("🔎 Searching the web...")
-                progress_bar.progress(20, text="Searching the web...")
-                time.sleep(0.3)  # Small visual delay
-
-                # Run the full research (we keep it in one call for simplicity)
-                with st.spinner("Fetching pages and performing semantic analysis..."):
-                    result = researcher.run(
-                        query=query,
-                        search_results=search_results,
-                        passages_per_page=passages_per_page,
-                        top_passages=top_passages,
-                        summary_sentences=summary_sentences,
-                        timeout=timeout
-                    )
+                stage_labels = {
+                    "embed_query": "🧠 Embedding query...",
+                    "search": "🔎 Searching the web...",
+                    "fetch": "🌐 Fetching pages...",
+                    "rank": "📊 Ranking passages...",
+                    "summary": "📝 Building summary...",
+                    "done": "✅ Done",
+                }
+
+                def on_progress(stage, fraction, detail=""):
+                    label = stage_labels.get(stage, stage)
+                    status_text.info(f"{label} {detail}")
+                    progress_bar.progress(min(100, int(fraction * 100)), text=label)
+
+                # Concurrent pipeline on the background loop; callbacks arrive in this script thread
+                result = researcher.run(
+                    query=query,
+                    search_results=search_results,
+                    passages_per_page=passages_per_page,
+                    top_passages=top_passages,
+                    summary_sentences=summary_sentences,
+                    timeout=timeout,
+                    progress=on_progress,
+                )
 
                 progress_bar.progress(100, text="Research completed!")
 
@@ -0,0 +1,1135 @@
+import os
+import re
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+import hashlib
+from contextlib import asynccontextmanager
+import numpy as np
+import pytest
+from aiohttp import web
+from research_core.pool import ResearchAgentPool
+from research_core.ranking import rank, top_k, mmr
+from research_core.search import SearchProvider, FixtureSearchProvider, search_all
+from research_core.extract import HtmlExtractor, extract_text
+from research_core.page_cache import PageCache, canonical_url
+from research_core.embed_cache import EmbeddingCache
+from research_core.result_cache import ResultCache, result_key
+from research_core.embed_service import EmbeddingService
+from research_core.chunking import TokenizedText
+from research_core.dedup import NearDuplicateFilter
+from research_core.bm25 import query_terms, bm25_scores, bm25_order
+from research_core import host_health
+from research_core.host_health import HostHealthRegistry, host_of
+from research_core.http import read_text_capped
+from research_core.sync_agent import SyncResearchAgent
+from research_core.vector_store import MmapVectorStore
+from research_core.maintenance import run_maintenance
+from research_core.embed_pool import MultiProcessEmbedder
+from research_core import embedders
+from research_core.embedders import OnnxEmbedder, load_embedder
+from research_core.http import HttpClient
+from agent5_async import ShortResearchAgent, fetch_page_async, prefilter_sentences
+
+
+class FakeAgent:
+    def __init__(self, embedder=None, chroma_client=None):
+        self.embedder = embedder or object()
+        self.chroma_client = chroma_client or object()
+
+    def shared_resources(self):
+        return {"embedder": self.embedder, "chroma_client": self.chroma_client}
+
+    async def run(self, query, **kwargs):
+        await asyncio.sleep(0.01)
+        return {"query": query, "agent": id(self)}
+
+    async def run_many(self, queries, **kwargs):
+        return {"results": [await self.run(q) for q in queries]}
+
+
+class TestResearchAgentPool:
+
+    def test_pool_warms_and_shares_model(self):
+        """All pooled agents reuse the first agent's embedder and client"""
+        pool = ResearchAgentPool(size=3, agent_factory=FakeAgent)
+        assert not pool.ready
+        asyncio.run(pool.start())
+        assert pool.ready
+        assert pool.status()["idle"] == 3
+        assert len({id(a.embedder) for a in pool._agents}) == 1
+
+    def test_concurrent_runs_bounded_by_size(self):
+        pool = ResearchAgentPool(size=2, agent_factory=FakeAgent)
+
+        async def go():
+            return await asyncio.gather(*[pool.run(f"q{i}") for i in range(6)])
+
+        results = asyncio.run(go())
+        assert [r["query"] for r in results] == [f"q{i}" for i in range(6)]
+        assert len({r["agent"] for r in results}) <= 2
+
+    def test_batch_runs_on_one_agent(self):
+        pool = ResearchAgentPool(size=2, agent_factory=FakeAgent)
+        batch = asyncio.run(pool.run_many(["a", "b", "c"]))
+        assert [r["query"] for r in batch["results"]] == ["a", "b", "c"]
+        assert len({r["agent"] for r in batch["results"]}) == 1
+
+    def test_background_start_reports_warming_then_ready(self):
+        class SlowAgent(FakeAgent):
+            def __init__(self, **kwargs):
+                time.sleep(0.2)
+                super().__init__(**kwargs)
+
+        async def go():
+            pool = ResearchAgentPool(size=1, agent_factory=SlowAgent)
+            assert pool.state == "cold"
+            task = pool.start_background()
+            await asyncio.sleep(0.05)
+            warming = pool.status()
+            await task
+            return warming, pool.status()
+
+        warming, ready = asyncio.run(go())
+        assert warming["state"] == "warming" and not warming["ready"]
+        assert ready["state"] == "ready" and ready["ready"]
+
+    def test_failed_background_start_is_reported(self):
+        def broken(**kwargs):
+            raise RuntimeError("model missing")
+
+        async def go():
+            pool = ResearchAgentPool(size=1, agent_factory=broken)
+            await pool.start_background()   # does not raise
+            return pool.status()
+
+        status = asyncio.run(go())
+        assert status["state"] == "error" and not status["ready"]
+        assert "model missing" in status["error"]
+
+
+class ProgressAgent(FakeAgent):
+    async def run(self, query, progress=None, **kwargs):
+        for stage, fraction in (("search", 0.1), ("fetch", 0.5), ("done", 1.0)):
+            await asyncio.sleep(0.01)
+            if progress:
+                progress(stage, fraction, "")
+        return {"query": query}
+
+
+class TestSyncResearchAgent:
+
+    def test_blocking_run_reports_progress_in_caller_thread(self):
+        import threading
+        caller = threading.get_ident()
+        events = []
+        agent = SyncResearchAgent(ResearchAgentPool(size=1, agent_factory=ProgressAgent))
+        try:
+            result = agent.run("heat", progress=lambda s, f, d: events.append((s, threading.get_ident() == caller)))
+            assert agent.run("again")["query"] == "again"
+        finally:
+            agent.close()
+        assert result["query"] == "heat"
+        assert events == [("search", True), ("fetch", True), ("done", True)]
+
+
+class TestRanking:
+
+    def test_rank_matches_argsort_order(self):
+        rng = np.random.default_rng(1)
+        embs = rng.standard_normal((200, 32))
+        q = rng.standard_normal(32)
+        idx, scores = rank(embs, q, 5)
+        expected = [float(embs[i] @ q / (np.linalg.norm(embs[i]) * np.linalg.norm(q))) for i in range(200)]
+        assert list(idx) == list(np.argsort(expected)[::-1][:5])
+        assert np.allclose(scores, expected, atol=1e-5)
+
+    def test_top_k_handles_small_inputs(self):
+        assert list(top_k(np.array([0.1, 0.9]), 5)) == [1, 0]
+        assert len(top_k(np.array([]), 3)) == 0
+
+    def test_mmr_skips_near_duplicates(self):
+        q = np.array([1.0, 0.0, 0.0])
+        embs = np.array([[1.0, 0.1, 0.0], [1.0, 0.11, 0.0], [0.7, 0.0, 0.7]])
+        assert list(rank(embs, q, 2)[0]) == [0, 1]
+        assert list(mmr(embs, q, 2, diversity=0.6)) == [0, 2]
+
+
+class SlowProvider(SearchProvider):
+    name = "slow"
+
+    async def search(self, query, max_results):
+        await asyncio.sleep(5)
+        return ["https://slow.example.com"]
+
+
+class TestSearchProviders:
+
+    def test_fixture_provider_and_timeout(self, tmp_path):
+        """A slow provider is cut off by its own timeout without losing fixture results"""
+        fixture = tmp_path / "search.json"
+        fixture.write_text('{"heat islands": ["https://a.example.com", "https://b.example.com"], "*": ["https://c.example.com"]}')
+        providers = [FixtureSearchProvider(str(fixture)), SlowProvider(timeout=0.05)]
+
+        urls = asyncio.run(search_all(providers, "heat islands", 10))
+        assert urls == ["https://a.example.com", "https://b.example.com"]
+        assert asyncio.run(search_all(providers, "unknown", 10)) == ["https://c.example.com"]
+
+
+class TestHtmlExtraction:
+
+    HTML = "<html><nav><p>menu</p></nav><body><script>x=1</script><p>Cool roofs   reflect heat.</p><p>Trees shade streets.</p></body></html>"
+
+    def test_extract_text_strips_boilerplate(self):
+        text, ms = extract_text(self.HTML)
+        assert text == "Cool roofs reflect heat. Trees shade streets."
+        assert ms >= 0
+
+    def test_extract_text_caps_input(self):
+        text, _ = extract_text("<p>" + "a " * 1000 + "</p>", max_chars=50)
+        assert len(text) < 50
+
+    def test_process_pool_extractor(self):
+        extractor = HtmlExtractor(workers=1)
+        try:
+            text, ms = asyncio.run(extractor.extract(self.HTML))
+        finally:
+            extractor.close()
+        assert text.startswith("Cool roofs")
+
+
+class TestPageCache:
+
+    def test_canonical_url(self):
+        assert canonical_url("HTTPS://Example.com:443/a?b=2&utm_source=x&a=1#frag") == "https://example.com/a?a=1&b=2"
+
+    def test_hit_stale_and_revalidate(self, tmp_path):
+        cache = PageCache(str(tmp_path / "pages.sqlite"), ttl=60)
+        assert cache.get("https://example.com/a") is None
+        cache.put("https://example.com/a", "cool roofs " * 50, etag='"v1"')
+        entry = cache.get("https://example.com/a#top")
+        assert entry["fresh"] and entry["text"].startswith("cool roofs")
+
+        cache.ttl = 0
+        stale = cache.get("https://example.com/a")
+        assert not stale["fresh"] and stale["etag"] == '"v1"'
+        cache.ttl = 60
+        cache.mark_revalidated("https://example.com/a")
+        assert cache.get("https://example.com/a")["fresh"]
+
+    def test_lru_eviction_by_size(self, tmp_path):
+        cache = PageCache(str(tmp_path / "pages.sqlite"), max_bytes=10**9)
+        for i in range(3):
+            cache.put(f"https://example.com/{i}", os.urandom(2000).hex())
+        cache.get("https://example.com/0")  # most recently used survives
+        cache.max_bytes = cache.stats()["bytes"] - 1
+        cache.put("https://example.com/3", "x")
+        assert cache.get("https://example.com/1") is None
+        assert cache.get("https://example.com/0") is not None
+
+
+class TestEmbeddingCache:
+
+    @staticmethod
+    def make_encoder(calls):
+        async def encode(texts):
+            calls.append(list(texts))
+            return np.array([[len(t), 1.0, 0.0] for t in texts], dtype=np.float32)
+        return encode
+
+    def test_only_uncached_text_is_encoded(self, tmp_path):
+        calls = []
+        cache = EmbeddingCache("test-model", str(tmp_path))
+        first = asyncio.run(cache.aencode(["a", "bb", "a"], self.make_encoder(calls)))
+        counter = {}
+        second = asyncio.run(cache.aencode(["bb", "ccc"], self.make_encoder(calls), counter))
+        assert calls == [["a", "bb"], ["ccc"]]
+        assert first[:, 0].tolist() == [1, 2, 1]
+        assert second[:, 0].tolist() == [2, 3]
+        assert counter == {"hits": 1, "misses": 1}
+
+    def test_persists_and_evicts_lru(self, tmp_path):
+        calls = []
+        cache = EmbeddingCache("test-model", str(tmp_path), capacity=2)
+        asyncio.run(cache.aencode(["a", "bb"], self.make_encoder(calls)))
+        asyncio.run(cache.aencode(["a"], self.make_encoder(calls)))      # "bb" is now LRU
+        asyncio.run(cache.aencode(["ccc"], self.make_encoder(calls)))    # evicts "bb"
+        cache.close()
+
+        reopened = EmbeddingCache("test-model", str(tmp_path), capacity=2)
+        keys, found = reopened.lookup(["a", "bb", "ccc"])
+        assert sorted(found) == [0, 2]
+        assert found[2][0] == 3
+
+    def test_instances_sharing_a_directory_never_share_a_slot(self, tmp_path):
+        """Two processes (API + Streamlit, uvicorn workers) on one RESEARCH_CACHE_DIR"""
+        a = EmbeddingCache("test-model", str(tmp_path), capacity=4)
+        b = EmbeddingCache("test-model", str(tmp_path), capacity=4)
+        a.store(a.lookup(["alpha"])[0], [[1.0, 1.0, 1.0]])
+        b.store(b.lookup(["beta"])[0], [[2.0, 2.0, 2.0]])
+        assert a.lookup(["alpha"])[1][0].tolist() == [1.0, 1.0, 1.0]
+        assert a.lookup(["beta"])[1][0].tolist() == [2.0, 2.0, 2.0]   # written by the other instance
+        assert b.lookup(["alpha"])[1][0].tolist() == [1.0, 1.0, 1.0]
+
+        # b last used "alpha", so its write evicts "beta"; the eviction is seen by a
+        b.store(b.lookup(["c", "d", "e"])[0], [[3.0] * 3, [4.0] * 3, [5.0] * 3])
+        keys, found = a.lookup(["alpha", "beta", "c", "d", "e"])
+        assert sorted(found) == [0, 2, 3, 4]
+        assert [found[i][0] for i in sorted(found)] == [1.0, 3.0, 4.0, 5.0]
+        assert a.stats()["entries"] == 4
+
+
+    def test_lookup_waiting_on_another_writer_does_not_block_the_loop(self, tmp_path):
+        cache = EmbeddingCache("test-model", str(tmp_path))
+        other = sqlite3.connect(str(tmp_path / "embeddings_test_model.sqlite"), isolation_level=None,
+                                check_same_thread=False)
+        other.execute("BEGIN EXCLUSIVE")   # another process mid-store
+        threading.Timer(0.5, other.rollback).start()
+        ticks = []
+
+        async def ticker():
+            while len(ticks) < 100:
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        async def go():
+            tick = asyncio.ensure_future(ticker())
+            embs = await cache.aencode(["a"], self.make_encoder([]))
+            tick.cancel()
+            return embs
+
+        try:
+            embs = asyncio.run(go())
+        finally:
+            other.close()
+            cache.close()
+        assert embs[:, 0].tolist() == [1]
+        assert len(ticks) > 20 and max(np.diff(ticks)) < 0.2   # the loop kept running during the wait
+
+
+class TestResultCache:
+
+    def test_key_normalizes_query(self):
+        params = {"search_results": 13, "top_passages": 5}
+        assert result_key("What causes  heat islands?", params) == result_key("what causes heat islands", params)
+        assert result_key("heat islands", params) != result_key("heat islands", {**params, "top_passages": 6})
+
+    def test_single_flight_and_persistence(self, tmp_path):
+        runs = []
+
+        async def compute(progress):
+            runs.append(1)
+            await asyncio.sleep(0.05)
+            return {"query": "q", "passages": [{"score": 0.9}], "summary": "s"}
+
+        cache = ResultCache(str(tmp_path / "results.sqlite"), ttl=60)
+
+        async def go():
+            return await asyncio.gather(*[cache.get_or_compute("k", compute) for _ in range(5)])
+
+        results = asyncio.run(go())
+        assert len(runs) == 1 and cache.coalesced == 4
+        assert all(r["summary"] == "s" for r in results)
+
+        reopened = ResultCache(str(tmp_path / "results.sqlite"), ttl=60)
+        assert asyncio.run(reopened.get_or_compute("k", compute))["cached"] is True
+        assert len(runs) == 1
+
+    def test_partial_runs_not_cached(self, tmp_path):
+        async def compute(progress):
+            return {"query": "q", "passages": [{"score": 0.9}], "summary": "s", "cut_short": ["fetch"]}
+
+        cache = ResultCache(str(tmp_path / "results.sqlite"), ttl=60)
+        asyncio.run(cache.get_or_compute("k", compute))
+        assert cache.get("k") is None
+
+    @staticmethod
+    def budgeted_compute(runs, duration=0.05):
+        """A run of the given duration that is cut short when it was given a deadline under 0.1s"""
+        def start(deadline):
+            async def compute(progress):
+                runs.append(deadline)
+                progress("fetch", 0.5, "")
+                await asyncio.sleep(duration)
+                progress("done", 1.0, "")
+                partial = deadline is not None and deadline < 0.1
+                return {"query": "q", "passages": [{"score": 0.9}], "summary": "s",
+                        "cut_short": ["fetch"] if partial else []}
+            return compute
+        return start
+
+    def test_no_deadline_caller_never_gets_a_partial_result(self, tmp_path):
+        runs = []
+        start = self.budgeted_compute(runs)
+        cache = ResultCache(str(tmp_path / "results.sqlite"), ttl=60)
+
+        async def go():
+            tight = asyncio.ensure_future(cache.get_or_compute("k", start(0.01), deadline=0.01))
+            await asyncio.sleep(0)
+            full = cache.get_or_compute("k", start(None))
+            return await asyncio.gather(tight, full)
+
+        tight, full = asyncio.run(go())
+        assert tight["cut_short"] == ["fetch"] and full["cut_short"] == []
+        assert runs == [0.01, None] and cache.coalesced == 0
+
+    def test_tighter_deadline_joins_and_gets_progress(self, tmp_path):
+        runs, events = [], []
+        start = self.budgeted_compute(runs)
+        cache = ResultCache(str(tmp_path / "results.sqlite"), ttl=60)
+
+        async def go():
+            first = asyncio.ensure_future(cache.get_or_compute("k", start(None)))
+            await asyncio.sleep(0.01)
+            joined = cache.get_or_compute("k", start(5.0), deadline=5.0,
+                                          progress=lambda stage, f, d: events.append(stage))
+            return await asyncio.gather(first, joined)
+
+        first, joined = asyncio.run(go())
+        assert runs == [None] and cache.coalesced == 1
+        assert joined["summary"] == "s" and not joined["cut_short"]
+        assert events == ["fetch", "done"]   # caught up on join, then the live event
+
+        # a joined run that outlives the joiner's deadline: the joiner leaves on time
+        runs.clear()
+        slow = self.budgeted_compute(runs, duration=0.6)
+
+        async def go_slow():
+            first = asyncio.ensure_future(cache.get_or_compute("slow", slow(None)))
+            await asyncio.sleep(0.01)
+            t0 = time.perf_counter()
+            joined = await cache.get_or_compute("slow", slow(0.15), deadline=0.15, fallback={"query": "q"})
+            elapsed = time.perf_counter() - t0
+            return await first, joined, elapsed
+
+        first, joined, elapsed = asyncio.run(go_slow())
+        assert elapsed < 0.4 and runs == [None]
+        assert joined["cut_short"] == ["inflight"] and joined["partial"] and joined["query"] == "q"
+        assert first["summary"] == "s" and not first["cut_short"]
+        assert cache.get("slow")["summary"] == "s"   # the shared run still completed and was cached
+
+
+class LengthEmbedder:
+    """Deterministic stand-in for SentenceTransformer.encode: [len(text), threads it was loaded with]"""
+    def __init__(self, threads=0):
+        self.calls = []
+        self.threads = threads
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        return np.array([[len(t), self.threads] for t in texts], dtype=np.float32)
+
+
+def length_loader(model_name, backend, num_threads=None):
+    """Picklable loader for MultiProcessEmbedder workers"""
+    return LengthEmbedder(num_threads or 0)
+
+
+class TestEmbeddingService:
+
+    def test_concurrent_requests_share_one_batch(self):
+        embedder = LengthEmbedder()
+        service = EmbeddingService(embedder, max_batch=64, max_wait_ms=50, num_threads=1)
+
+        async def go():
+            return await asyncio.gather(
+                service.encode(["aaaa", "b"]), service.encode(["cc"]), service.encode(["ddd", "eeeee"]))
+
+        try:
+            a, b, c = asyncio.run(go())
+        finally:
+            service.close()
+        assert a[:, 0].tolist() == [4, 1] and b[:, 0].tolist() == [2] and c[:, 0].tolist() == [3, 5]
+        assert len(embedder.calls) == 1
+        assert embedder.calls[0] == sorted(embedder.calls[0], key=len)  # length-bucketed
+
+    def test_flushes_at_max_batch(self):
+        embedder = LengthEmbedder()
+        service = EmbeddingService(embedder, max_batch=2, max_wait_ms=1000, num_threads=1)
+
+        async def go():
+            return await asyncio.gather(*[service.encode([f"t{i}"]) for i in range(4)])
+
+        try:
+            asyncio.run(asyncio.wait_for(go(), timeout=2))
+        finally:
+            service.close()
+        assert [len(c) for c in embedder.calls] == [2, 2]
+
+
+class TestChunking:
+
+    TEXT = " ".join(f"Word{i}." if i % 7 == 6 else f"wörd{i}" for i in range(300))
+
+    def test_passages_match_word_windows(self):
+        words = self.TEXT.split()
+        passages = TokenizedText(self.TEXT).passages(max_words=120, overlap=20)
+        assert [p.text for p in passages] == [" ".join(words[i:i + 120]) for i in range(0, 300, 100)]
+
+    def test_sentences_from_precomputed_boundaries(self):
+        passage = TokenizedText("Cool roofs help. Trees shade streets! Why? Because heat").passages()[0]
+        assert passage.sentences() == ["Cool roofs help.", "Trees shade streets!", "Why?", "Because heat"]
+
+    def test_empty_text(self):
+        assert TokenizedText("").passages() == []
+
+
+class TestNearDuplicateFilter:
+
+    BASE = " ".join(f"token{i}" for i in range(120))
+
+    def test_drops_near_copy(self):
+        dedup = NearDuplicateFilter(threshold=0.6)
+        assert not dedup.seen(self.BASE)
+        assert dedup.seen(self.BASE.replace("token60", "changed60"))
+        assert dedup.removed == 1
+
+    def test_keeps_distinct_passages(self):
+        dedup = NearDuplicateFilter()
+        assert not dedup.seen(self.BASE)
+        assert not dedup.seen(" ".join(f"other{i}" for i in range(120)))
+        assert dedup.removed == 0
+
+
+class TestBM25:
+
+    CHUNKS = ["site navigation and cookie notice", "history of the city council",
+              "cool roofs reflect sunlight and reduce urban heat", "contact us"]
+
+    def test_relevant_chunk_ranked_first(self):
+        terms = query_terms("How do cool roofs reduce urban heat?")
+        assert terms == ["cool", "roofs", "reduce", "urban", "heat"]
+        assert bm25_order(terms, self.CHUNKS)[0] == 2
+
+    def test_no_hits_keeps_page_order(self):
+        assert bm25_scores(["glacier"], self.CHUNKS).sum() == 0
+        assert bm25_order(["glacier"], self.CHUNKS) == [0, 1, 2, 3]
+
+
+class TestHostHealth:
+
+    def test_skips_after_repeated_failures(self, tmp_path):
+        health = HostHealthRegistry(str(tmp_path / "hosts.sqlite"), fail_threshold=2)
+        health.record_failure("https://slow.example/a", "TimeoutError")
+        assert not health.should_skip("https://slow.example/b")
+        health.record_failure("https://slow.example/a", 403)
+        assert health.should_skip("https://slow.example/b")
+        assert not health.should_skip("https://other.example/")
+
+    def test_timeout_from_p95_and_persistence(self, tmp_path):
+        path = str(tmp_path / "hosts.sqlite")
+        health = HostHealthRegistry(path)
+        for latency in (2.0, 2.5, 3.0, 4.0):
+            health.record_success("https://site.example/x", latency)
+        assert 4.0 < health.timeout_for("https://site.example/y", 16) < 6.0
+        assert health.timeout_for("https://new.example/", 16) == 16
+        health.close()
+        assert HostHealthRegistry(path).timeout_for("https://site.example/y", 16) > 4.0
+
+
+class FakeStream:
+    def __init__(self, data, chunk):
+        self.chunks = [data[i:i + chunk] for i in range(0, len(data), chunk)]
+
+    async def iter_chunked(self, n):
+        while self.chunks:
+            yield self.chunks.pop(0)
+
+    def at_eof(self):
+        return not self.chunks
+
+
+class FakeResponse:
+    charset = "utf-8"
+
+    def __init__(self, data, chunk=7):
+        self.content = FakeStream(data, chunk)
+
+
+class TestCappedRead:
+
+    TEXT = "héllo wörld " * 50
+
+    def test_full_body_decodes_across_chunk_boundaries(self):
+        text, truncated = asyncio.run(read_text_capped(FakeResponse(self.TEXT.encode("utf-8")), max_bytes=10_000))
+        assert text == self.TEXT and not truncated
+
+    def test_stops_at_byte_cap(self):
+        text, truncated = asyncio.run(read_text_capped(FakeResponse(self.TEXT.encode("utf-8")), max_bytes=100))
+        assert truncated and len(text.encode("utf-8")) <= 100
+        assert self.TEXT.startswith(text)
+
+
+class TestMmapVectorStore:
+
+    def _add(self, store, n, dim=8, ts=1000.0, seed=0):
+        rng = np.random.default_rng(seed)
+        embs = rng.standard_normal((n, dim)).astype(np.float32)
+        ids = [f"p{seed}_{i}" for i in range(n)]
+        metas = [{"url": f"https://x.example/{i}", "query": "q", "timestamp": ts} for i in range(n)]
+        return embs, store.add(ids, embs, [f"doc {i}" for i in range(n)], metas)
+
+    def test_add_grow_query_and_reopen(self, tmp_path):
+        store = MmapVectorStore(str(tmp_path), initial_rows=4)
+        embs, added = self._add(store, 10)
+        assert added == 10 and store.capacity >= 10
+        assert self._add(store, 10)[1] == 0   # same ids are skipped
+        docs, metas, found = store.query(embs[7], 3)
+        assert docs[0] == "doc 7" and metas[0]["url"] == "https://x.example/7"
+        assert found.shape == (3, 8) and found.dtype == np.float32
+        store.close()
+
+        reopened = MmapVectorStore(str(tmp_path))
+        assert reopened.count() == 10
+        assert reopened.query(embs[3], 1)[0] == ["doc 3"]
+
+    def test_timestamp_filter(self, tmp_path):
+        store = MmapVectorStore(str(tmp_path))
+        embs, _ = self._add(store, 5, ts=100.0)
+        self._add(store, 5, ts=500.0, seed=1)
+        docs, metas, _ = store.query(embs[0], 10, min_timestamp=200.0)
+        assert len(docs) == 5 and all(m["timestamp"] == 500.0 for m in metas)
+
+
+    def test_second_process_compacting_under_a_running_app(self, tmp_path):
+        """The maintenance CLI opens its own store on the directory the app is using"""
+        app = MmapVectorStore(str(tmp_path), initial_rows=4)
+        embs, _ = self._add(app, 10)
+        cli = MmapVectorStore(str(tmp_path), initial_rows=4)
+        assert cli.delete([f"p0_{i}" for i in range(6)]) == 6 and cli.compact()
+        cli.close()
+
+        # the app picks up the new files and row numbers instead of writing past them
+        new, added = self._add(app, 3, seed=1)
+        assert added == 3 and app.count() == 7
+        assert app.query(embs[8], 1)[0] == ["doc 8"]
+        assert app.query(new[2], 1)[0] == ["doc 2"]
+        assert sorted(app.query(embs[0], 20)[0]) == sorted([f"doc {i}" for i in range(6, 10)] + ["doc 0", "doc 1", "doc 2"])
+
+    def test_interrupted_compaction_keeps_the_old_generation(self, tmp_path, monkeypatch):
+        store = MmapVectorStore(str(tmp_path), initial_rows=4)
+        embs, _ = self._add(store, 10)
+        store.delete([f"p0_{i}" for i in range(5)])
+
+        def crash(*args):
+            raise RuntimeError("killed mid-compaction")
+        monkeypatch.setattr(store, "_switch_generation", crash)
+        with pytest.raises(RuntimeError):
+            store.compact()
+        store.close()
+
+        reopened = MmapVectorStore(str(tmp_path), initial_rows=4)
+        assert reopened.count() == 5 and reopened.generation == 0
+        assert [reopened.query(embs[i], 1)[0][0] for i in range(5, 10)] == [f"doc {i}" for i in range(5, 10)]
+        assert reopened.compact() and reopened.generation == 1
+        assert [reopened.query(embs[i], 1)[0][0] for i in range(5, 10)] == [f"doc {i}" for i in range(5, 10)]
+        assert sorted(f for f in os.listdir(tmp_path) if f.startswith("vectors")) == ["vectors.1.f16"]
+
+
+class TestMaintenance:
+
+    def test_ttl_duplicates_cap_and_compaction(self, tmp_path):
+        store = MmapVectorStore(str(tmp_path), initial_rows=4)
+        rng = np.random.default_rng(0)
+        embs = rng.standard_normal((12, 8)).astype(np.float32)
+        now = time.time()
+        docs = [f"passage {i}" for i in range(10)] + ["Passage  3", "passage 4"]  # two syndicated copies
+        stamps = [now - 90 * 86400] * 2 + [now - i for i in range(10)]            # two expired
+        metas = [{"url": f"https://x.example/{i}", "query": "q", "timestamp": t} for i, t in enumerate(stamps)]
+        store.add([f"id{i}" for i in range(12)], embs, docs, metas)
+
+        report = run_maintenance(store, ttl=30 * 86400, max_count=6, max_bytes=0)
+        assert report["before"]["passages"] == 12
+        assert (report["expired"], report["duplicates"], report["over_cap"]) == (2, 2, 2)
+        assert report["after"]["passages"] == 6 and report["compacted"]
+        assert store.capacity == 8
+
+        # the newest passages survive and are still found after rows moved
+        assert store.query(embs[4], 1)[0] == ["passage 4"]
+        assert sorted(store.query(embs[0], 12)[0]) == [f"passage {i}" for i in range(2, 8)]
+
+    def test_byte_cap_uses_live_data_and_does_not_drain(self, tmp_path):
+        class NoCompactStore(MmapVectorStore):
+            def compact(self):
+                return False
+
+        store = NoCompactStore(str(tmp_path), initial_rows=64)
+        rng = np.random.default_rng(0)
+        now = time.time()
+        n = 40
+        store.add([f"id{i}" for i in range(n)], rng.standard_normal((n, 8)).astype(np.float32),
+                  [f"passage number {i:04d}" for i in range(n)],
+                  [{"url": "u", "timestamp": now - i} for i in range(n)])
+        per_row = store.live_bytes() / n
+        assert store.size_bytes() > store.live_bytes()   # preallocated rows + sidecar overhead
+        cap = int(per_row * 25)
+
+        counts = []
+        for _ in range(3):
+            report = run_maintenance(store, ttl=0, max_count=0, max_bytes=cap)
+            counts.append(report["after"]["passages"])
+            assert report["bytes_cap_met"] and report["after"]["live_bytes"] <= cap
+        assert counts == [25, 25, 25]
+
+
+class TestMultiProcessEmbedder:
+
+    def test_chunks_come_back_contiguous_in_order(self):
+        texts = ["x" * n for n in (5, 1, 9, 3, 7, 2, 8)]
+        embedder = MultiProcessEmbedder("fake", processes=2, chunk_size=2, loader=length_loader)
+        try:
+            embs = embedder.encode(texts)
+        finally:
+            embedder.close()
+        assert embs.flags["C_CONTIGUOUS"] and embs.dtype == np.float32
+        assert embs[:, 0].tolist() == [5, 1, 9, 3, 7, 2, 8]
+        # each worker's model is loaded with its share of the cores, whatever the backend
+        assert set(embs[:, 1].tolist()) == {max(1, (os.cpu_count() or 1) // 2)}
+
+    def test_service_routes_large_batches_to_processes(self):
+        mp = MultiProcessEmbedder("fake", processes=1, loader=length_loader)
+        service = EmbeddingService(LengthEmbedder(), max_wait_ms=1, mp_embedder=mp, mp_threshold=4)
+
+        async def go():
+            return await service.encode(["a"]), await service.encode(["bb"] * 5)
+
+        try:
+            small, large = asyncio.run(go())
+        finally:
+            service.close()
+        assert small[:, 0].tolist() == [1] and large[:, 0].tolist() == [2] * 5
+        assert service.counters["mp_batches"] == 1 and mp.texts == 5
+
+
+class WordEmbedder:
+    """Deterministic bag-of-words stand-in for SentenceTransformer: one hashed bucket per word"""
+    def __init__(self, dim=64):
+        self.dim = dim
+
+    def encode(self, texts, **kwargs):
+        out = np.full((len(texts), self.dim), 0.01, dtype=np.float32)
+        for i, t in enumerate(texts):
+            for w in re.findall(r"[a-z]+", t.lower()):
+                out[i, int(hashlib.md5(w.encode()).hexdigest(), 16) % self.dim] += 1.0
+        return out
+
+
+def word_loader(model_name, backend, num_threads=None):
+    """Picklable loader giving MultiProcessEmbedder workers the WordEmbedder"""
+    return WordEmbedder()
+
+
+def page_html(topic, n=12):
+    """A page whose sentences mention topic and are distinct enough to survive MinHash dedup"""
+    return "<html><body>" + "".join(
+        f"<p>Report {topic} {j}: {topic} grows where {topic} sample {j * 7} meets field {j * 13}.</p>"
+        for j in range(n)) + "</body></html>"
+
+
+@asynccontextmanager
+async def page_server(pages, delays=None):
+    """Local aiohttp server: GET /<name> returns pages[name] after delays[name] seconds"""
+    delays = delays or {}
+
+    async def handler(request):
+        name = request.match_info["name"]
+        await asyncio.sleep(delays.get(name, 0))
+        return web.Response(text=pages[name], content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/{name}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        await runner.cleanup()
+
+
+@asynccontextmanager
+async def research_agent(tmp_path, results=None, **kwargs):
+    """ShortResearchAgent wired to temp caches, a fixture search provider and the WordEmbedder"""
+    fixture = tmp_path / "search.json"
+    fixture.write_text(json.dumps(results or {}))
+    options = dict(embed_model="word-test", embedder=WordEmbedder(),
+                   search_providers=[FixtureSearchProvider(str(fixture))],
+                   page_cache=PageCache(str(tmp_path / "pages.sqlite")),
+                   embed_cache=EmbeddingCache("word-test", str(tmp_path / "embed")),
+                   result_cache=ResultCache(str(tmp_path / "results.sqlite")),
+                   host_health=HostHealthRegistry(str(tmp_path / "hosts.sqlite")),
+                   http_client=HttpClient(limit_per_host=16),
+                   vector_store=MmapVectorStore(str(tmp_path / "vectors")))
+    options.update(kwargs)
+    agent = ShortResearchAgent(**options)
+    try:
+        yield agent
+    finally:
+        await agent.aclose()
+        await agent.http.close()
+        agent.embed_service.close()
+        agent.vector_store.close()
+
+
+class TestStreamingPipeline:
+
+    PAGES = {f"p{i}": page_html(f"heat{i}") for i in range(6)}
+
+    def _stream(self, tmp_path, delays, **kwargs):
+        async def go():
+            async with page_server(self.PAGES, delays) as base, research_agent(tmp_path) as agent:
+                q_emb = (await agent._embed(["heat"]))[0]
+                t0 = time.monotonic()
+                docs, embs, stats = await agent._stream_passages(
+                    [f"{base}/{name}" for name in self.PAGES], q_emb, timeout=10, passages_per_page=2, **kwargs)
+                return docs, embs, stats, time.monotonic() - t0
+        return asyncio.run(go())
+
+    def test_all_pages_without_early_stop_or_deadline(self, tmp_path):
+        docs, embs, stats, _ = self._stream(tmp_path, {}, early_stop_score=None, fetch_deadline=None)
+        assert stats["pages_fetched"] == 6 and stats["pages_cancelled"] == 0
+        assert not stats["early_stopped"] and not stats["deadline_hit"]
+        assert len(docs) == 12 and embs.shape == (12, 64)
+
+    def test_early_stop_cancels_remaining_fetches(self, tmp_path):
+        slow = {"p3": 5, "p4": 5, "p5": 5}
+        docs, _, stats, elapsed = self._stream(tmp_path, slow, early_stop_score=0.0, early_stop_count=6,
+                                               fetch_deadline=None)
+        assert stats["early_stopped"] and not stats["deadline_hit"]
+        assert stats["pages_cancelled"] == 3 and stats["pages_fetched"] == 3
+        assert not any(d["url"].endswith(tuple(slow)) for d in docs)
+        assert elapsed < 4
+
+    def test_fetch_deadline_cancels_slow_pages(self, tmp_path):
+        slow = {"p0": 5, "p1": 5}
+        docs, _, stats, elapsed = self._stream(tmp_path, slow, early_stop_score=None, fetch_deadline=1.0)
+        assert stats["deadline_hit"] and not stats["early_stopped"]
+        assert stats["pages_cancelled"] == 2 and stats["pages_fetched"] == 4
+        assert len(docs) == 8
+        assert elapsed < 4
+
+
+class TestProcessPoolEmbedding:
+
+    PAGES = {f"p{i}": page_html(f"heat{i}", n=80) for i in range(25)}
+
+    def test_large_run_is_embedded_by_the_worker_processes(self, tmp_path):
+        mp = MultiProcessEmbedder("word-test", processes=2, loader=word_loader)
+        service = EmbeddingService(WordEmbedder(), mp_embedder=mp)
+
+        async def go():
+            async with page_server(self.PAGES) as base:
+                results = {"heat": [f"{base}/{name}" for name in self.PAGES]}
+                async with research_agent(tmp_path, results=results, embed_service=service) as agent:
+                    return await agent.run("heat", search_results=25, passages_per_page=10,
+                                           local_first=False, early_stop_score=None, fetch_deadline=None)
+
+        result = asyncio.run(go())
+        assert result["pipeline"]["pages_fetched"] == 25 and result["passages"]
+        assert service.counters["mp_batches"] >= 1
+        assert mp.texts >= service.mp_threshold   # the passages went out as pool-sized jobs
+
+
+class TestPassagePersistence:
+
+    PASSAGES = [{"url": "https://a.example/1", "passage": "urban heat islands form over asphalt"},
+                {"url": "https://b.example/2", "passage": "cool roofs reflect sunlight"}]
+
+    def test_second_persist_of_same_passages_adds_nothing(self, tmp_path):
+        async def go():
+            async with research_agent(tmp_path) as agent:
+                embs = await agent._embed([p["passage"] for p in self.PASSAGES])
+                first = agent._persist_passages(self.PASSAGES, embs, "heat")
+                second = agent._persist_passages(self.PASSAGES, embs, "heat again")
+                return first, second, agent.vector_store.count()
+
+        assert asyncio.run(go()) == (2, 0, 2)
+
+    def test_background_write_is_drained_by_aclose(self, tmp_path):
+        async def go():
+            async with research_agent(tmp_path) as agent:
+                embs = await agent._embed([p["passage"] for p in self.PASSAGES])
+                agent._schedule_persist(self.PASSAGES, embs, "heat")
+                assert agent._pending_writes       # fire-and-forget: not written yet
+                await agent.aclose()
+                assert not agent._pending_writes
+                docs, metas, found = agent.vector_store.query(embs[1], 1)
+                return agent.vector_store.count(), docs, metas, found, embs
+
+        count, docs, metas, found, embs = asyncio.run(go())
+        assert count == 2
+        assert docs == ["cool roofs reflect sunlight"] and metas[0]["query"] == "heat"
+        # the stored vector is ours (float16, normalized), not a re-embedding
+        assert np.allclose(found[0], embs[1] / np.linalg.norm(embs[1]), atol=1e-3)
+
+
+class CountingProvider(SearchProvider):
+    name = "counting"
+
+    def __init__(self, urls=()):
+        super().__init__()
+        self.urls = list(urls)
+        self.calls = 0
+
+    async def search(self, query, max_results):
+        self.calls += 1
+        return self.urls[:max_results]
+
+
+class TestLocalFirst:
+
+    QUERY = "urban heat islands"
+    STRONG = ["urban heat islands trap heat in dense cities",
+              "urban heat islands are hotter than nearby rural land",
+              "heat islands in urban areas raise night temperatures"]
+    PAGES = {f"p{i}": page_html(f"heat{i}") for i in range(3)}
+
+    def _run(self, tmp_path, stored, timestamp=None, pages=False, **params):
+        """Store (text, age-in-seconds) passages, then research QUERY with the web pages available"""
+        async def go():
+            async with page_server(self.PAGES) as base:
+                provider = CountingProvider([f"{base}/{name}" for name in self.PAGES] if pages else [])
+                async with research_agent(tmp_path, search_providers=[provider]) as agent:
+                    if stored:
+                        texts = [t for t, _ in stored]
+                        embs = agent.embedder.encode(texts)
+                        now = time.time()
+                        agent.vector_store.add([f"local{i}" for i in range(len(texts))], embs, texts,
+                                               [{"url": f"https://local.example/{i}", "query": "earlier",
+                                                 "timestamp": now - age} for i, (_, age) in enumerate(stored)])
+                    result = await agent.run(self.QUERY, use_cache=False, **params)
+                    return result, provider.calls
+        return asyncio.run(go())
+
+    def test_answers_from_store_without_searching(self, tmp_path):
+        result, searches = self._run(tmp_path, [(t, 60) for t in self.STRONG], top_passages=3)
+        assert searches == 0
+        assert result["source"] == "local" and result["local_hits"] == 3
+        assert result["pipeline"]["pages_fetched"] == 0
+        assert {p["passage"] for p in result["passages"]} == set(self.STRONG)
+
+    def test_shortfall_is_filled_from_the_web(self, tmp_path):
+        result, searches = self._run(tmp_path, [(self.STRONG[0], 60)], pages=True, top_passages=3)
+        assert searches == 1
+        assert result["source"] == "mixed" and result["local_hits"] == 1
+        assert result["pipeline"]["pages_fetched"] == 3
+        assert result["passages"][0]["passage"] == self.STRONG[0]
+
+    def test_weak_passages_are_not_used(self, tmp_path):
+        stored = [("cool roofs reflect sunlight", 60), ("bike lanes and parking policy", 60)]
+        result, searches = self._run(tmp_path, stored, pages=True, top_passages=2)
+        assert searches == 1
+        assert result["source"] == "web" and result["local_hits"] == 0
+        # ...unless the caller lowers local_min_score (same store, now also holding the persisted web passages)
+        lowered, searches = self._run(tmp_path, [], pages=True, top_passages=2, local_min_score=-1.0)
+        assert searches == 0 and lowered["source"] == "local"
+
+    def test_stale_passages_are_not_used(self, tmp_path):
+        stored = [(t, 30 * 24 * 3600) for t in self.STRONG]
+        result, searches = self._run(tmp_path, stored, pages=True, top_passages=3)
+        assert searches == 1 and result["local_hits"] == 0
+        fresh_enough, searches = self._run(tmp_path, [], top_passages=3, local_max_age=60 * 24 * 3600)
+        assert searches == 0 and fresh_enough["source"] == "local"
+        assert {p["passage"] for p in fresh_enough["passages"]} == set(self.STRONG)
+
+    def test_refetched_page_does_not_repeat_local_passages(self, tmp_path):
+        async def go():
+            async with page_server(self.PAGES) as base:
+                provider = CountingProvider([f"{base}/{name}" for name in self.PAGES])
+                async with research_agent(tmp_path, search_providers=[provider]) as agent:
+                    await agent.run(self.QUERY, use_cache=False, local_first=False, top_passages=3)
+                    await agent.aclose()   # the persisted web passages are now local knowledge
+                    # room for every passage: 3 local + 6 from the same pages fetched again
+                    return await agent.run("heat grows where the field meets the sample", use_cache=False,
+                                           top_passages=9, local_min_score=0.3)
+
+        result = asyncio.run(go())
+        assert result["source"] == "mixed" and result["local_hits"] == 3
+        assert result["pipeline"]["pages_fetched"] == 3
+        keys = [(p["url"], p["passage"]) for p in result["passages"]]
+        assert len(keys) == 6 and len(set(keys)) == 6
+
+    def test_local_first_off_always_searches(self, tmp_path):
+        result, searches = self._run(tmp_path, [(t, 60) for t in self.STRONG], pages=True, top_passages=3,
+                                     local_first=False)
+        assert searches == 1 and result["local_hits"] == 0 and result["source"] == "web"
+
+
+class FakeTokenizer:
+    """Word-per-token tokenizer padding to the longest text, like a HF tokenizer returning numpy arrays"""
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts, padding=True, truncation=True, max_length=None, return_tensors="np"):
+        self.calls.append({"texts": list(texts), "max_length": max_length})
+        lengths = [min(len(t.split()), max_length) for t in texts]
+        width = max(lengths)
+        mask = np.array([[1] * n + [0] * (width - n) for n in lengths], dtype=np.int32)
+        return {"input_ids": mask * 7, "attention_mask": mask, "token_type_ids": np.zeros_like(mask)}
+
+
+class FakeSession:
+    """Token j of every text gets hidden state [j + 1, 1]; padded positions get a huge value"""
+    def __init__(self):
+        self.feeds = []
+
+    def run(self, outputs, feed):
+        self.feeds.append(feed)
+        mask = feed["attention_mask"]
+        hidden = np.stack([np.arange(1, mask.shape[1] + 1, dtype=np.float32),
+                           np.ones(mask.shape[1], dtype=np.float32)], axis=-1)
+        hidden = np.broadcast_to(hidden, mask.shape + (2,)).copy()
+        hidden[mask == 0] = 1e6
+        return [hidden]
+
+
+class TestOnnxEmbedder:
+
+    def make(self, max_seq_length=256):
+        embedder = OnnxEmbedder.__new__(OnnxEmbedder)   # skip export / onnxruntime session
+        embedder.tokenizer, embedder.session = FakeTokenizer(), FakeSession()
+        embedder.max_seq_length = max_seq_length
+        embedder._input_names = {"input_ids", "attention_mask"}
+        embedder._dim = None
+        return embedder
+
+    def test_masked_mean_pool_then_normalise(self):
+        embedder = self.make()
+        embs = embedder.encode(["one two three", "one"], batch_size=8)
+        # text 0: mean of [1,1],[2,1],[3,1] = [2,1]; text 1: [1,1] (padding ignored)
+        expected = np.array([[2.0, 1.0], [1.0, 1.0]])
+        expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+        assert embs.dtype == np.float32 and np.allclose(embs, expected)
+        # only inputs the graph declares are fed, as int64
+        assert set(embedder.session.feeds[0]) == {"input_ids", "attention_mask"}
+        assert embedder.session.feeds[0]["input_ids"].dtype == np.int64
+
+    def test_batches_truncation_and_raw_output(self):
+        embedder = self.make(max_seq_length=2)
+        embs = embedder.encode(["a b c d", "a", "a b"], batch_size=2, normalize_embeddings=False)
+        assert [len(c["texts"]) for c in embedder.tokenizer.calls] == [2, 1]
+        assert embedder.tokenizer.calls[0]["max_length"] == 2
+        assert np.allclose(embs, [[1.5, 1.0], [1.0, 1.0], [1.5, 1.0]])
+        assert embedder.encode("a b").shape == (2,)
+        assert embedder.get_sentence_embedding_dimension() == 2
+
+    def test_load_embedder_dispatch(self, monkeypatch):
+        import sys
+        import types
+        built = []
+        fake_st = types.ModuleType("sentence_transformers")
+        fake_st.SentenceTransformer = lambda name: built.append(("torch", name)) or "st"
+        monkeypatch.setitem(sys.modules, "sentence_transformers", fake_st)
+        monkeypatch.setattr(embedders, "OnnxEmbedder",
+                            lambda name, quantize=False, num_threads=None: built.append(
+                                ("onnx", name, quantize, num_threads)) or "ort")
+        assert load_embedder("m", "torch") == "st"
+        assert load_embedder("m", "onnx") == "ort"
+        assert load_embedder("m", "onnx-int8", num_threads=2) == "ort"
+        assert built == [("torch", "m"), ("onnx", "m", False, None), ("onnx", "m", True, 2)]
+        with pytest.raises(ValueError, match="Unknown embedding backend"):
+            load_embedder("m", "tensorflow")
+
+
+class TestHostTimeouts:
+    """More URLs on one host than HttpClient.limit_per_host: requests queue for a connection slot"""
+
+    PAGES = {f"p{i}": page_html(f"slot{i}", n=2) for i in range(8)}
+
+    def _fetch_all(self, tmp_path, delay, timeout, seed_latency=None, limit_per_host=2):
+        async def go():
+            health = HostHealthRegistry(str(tmp_path / "hosts.sqlite"))
+            client = HttpClient(limit_per_host=limit_per_host)
+            async with page_server(self.PAGES, {name: delay for name in self.PAGES}) as base:
+                for _ in range(5 if seed_latency else 0):
+                    health.record_success(f"{base}/p0", seed_latency)
+                pages = await asyncio.gather(*[fetch_page_async(client.session(), f"{base}/{name}", timeout,
+                                                                health=health) for name in self.PAGES])
+            await client.close()
+            return pages, health, f"{base}/p0"
+        return asyncio.run(go())
+
+    def test_queueing_does_not_trip_the_adaptive_timeout(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(host_health, "DEFAULT_MIN_TIMEOUT", 0.1)
+        # p95 0.4s -> per-host timeout 0.6s; 8 pages x 0.2s over 2 slots take 0.8s end to end
+        pages, health, url = self._fetch_all(tmp_path, delay=0.2, timeout=16, seed_latency=0.4)
+        assert [p["status"] for p in pages] == [200] * 8
+        assert health._hosts[host_of(url)].failed == 0 and not health.should_skip(url)
+        # latencies are sampled from socket acquisition, so queueing does not inflate them
+        assert max(list(health._hosts[host_of(url)].latencies)[5:]) < 0.35
+
+    def test_timeouts_while_queued_are_not_host_failures(self, tmp_path):
+        # 0.4s pages, 0.6s overall timeout: wave 1 succeeds, wave 2 times out on the host,
+        # waves 3-4 time out still waiting for a slot
+        pages, health, url = self._fetch_all(tmp_path, delay=0.4, timeout=0.6)
+        statuses = [p["status"] for p in pages]
+        assert statuses.count(200) == 2 and statuses.count(None) == 6
+        assert health._hosts[host_of(url)].failed == 2
+
+
+class TestBatchResearch:
+
+    PAGES = {name: page_html(name) for name in ("solar", "wind", "hydro")}
+
+    def _run_many(self, tmp_path, queries):
+        async def go():
+            async with page_server(self.PAGES) as base:
+                results = {"solar power": [f"{base}/solar", f"{base}/wind"],
+                           "wind power": [f"{base}/wind", f"{base}/hydro"]}
+                async with research_agent(tmp_path, results=results) as agent:
+                    return await agent.run_many(queries, top_passages=2), base
+        return asyncio.run(go())
+
+    def test_shared_fetches_and_per_query_ranking(self, tmp_path):
+        batch, base = self._run_many(tmp_path, ["solar power", "wind power"])
+        assert batch["urls_total"] == 4 and batch["urls_unique"] == 3
+        assert batch["pipeline"]["pages_fetched"] == 3          # the shared page is fetched once
+        solar, wind = batch["results"]
+        assert [r["query"] for r in batch["results"]] == ["solar power", "wind power"]
+        # one matmul ranks the shared passages differently for each query
+        assert {p["url"] for p in solar["passages"]} == {f"{base}/solar"}
+        assert {p["url"] for p in wind["passages"]} == {f"{base}/wind"}
+        assert solar["passages"][0]["score"] >= solar["passages"][1]["score"]
+        assert "solar" in solar["summary"].lower() and "wind" in wind["summary"].lower()
+
+    def test_one_result_per_input_query(self, tmp_path):
+        batch, _ = self._run_many(tmp_path, ["solar power", "wind power", " solar power "])
+        assert [r["query"] for r in batch["results"]] == ["solar power", "wind power", "solar power"]
+        assert batch["results"][2]["passages"] == batch["results"][0]["passages"]
+        assert batch["urls_total"] == 4                          # the repeat is not searched again
+
+    def test_blank_query_rejected(self, tmp_path):
+        with pytest.raises(ValueError, match="blank"):
+            self._run_many(tmp_path, ["solar power", "  "])
+
+
+class TestSentencePrefilter:
+
+    @staticmethod
+    def sentences(texts, passage_scores=None):
+        scores = passage_scores or [0.0] * len(texts)
+        return [{"sent": t, "url": "u", "lead": i == 0, "passage_score": sc}
+                for i, (t, sc) in enumerate(zip(texts, scores))]
+
+    def test_limit_and_original_order(self):
+        texts = [f"filler sentence number {i}" for i in range(30)]
+        for i in (25, 3, 17):
+            texts[i] = f"urban heat islands sentence {i}"
+        kept = prefilter_sentences("urban heat islands", self.sentences(texts), limit=3)
+        assert [s["sent"] for s in kept] == [texts[3], texts[17], texts[25]]
+
+    def test_passage_prior_keeps_sentences_without_query_terms(self):
+        texts = ["urban heat islands are mentioned here", "asphalt stores warmth all day",
+                 "an unrelated remark", "another unrelated remark"]
+        kept = prefilter_sentences("urban heat islands", self.sentences(texts, [0.2, 0.95, 0.1, 0.1]), limit=2)
+        assert [s["sent"] for s in kept] == texts[:2]
+
+    def test_below_limit_or_disabled_keeps_everything(self):
+        sents = self.sentences(["a b", "c d", "e f"])
+        assert prefilter_sentences("x", sents, limit=5) == sents
+        assert prefilter_sentences("x", sents, limit=0) == sents
+        assert prefilter_sentences("x", sents, limit=None) == sents